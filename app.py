@@ -4,10 +4,14 @@ import shutil
 from flask_cors import CORS
 from controllers.station_controllers import get_stations, get_station_details, copy_to_inputs_folder, copy_files_to_output, open_file, upload_input_file
 from components.file_checker import check_documents
+from components.tag_data_verifier import verify_tag_data
 from file_generators.tag_data_excel_formatted_generator import process_excel
 from file_generators.tag_data_pdf_generator import process_pdf
+from file_generators.tag_data_batch_generator import generate_batch
+from file_generators.tag_data_documents_generator import generate_td_documents
 from file_generators.rfid_pdf_generator import generate_pdf_with_rfid_image
 from file_generators.toc_pdf_generator import generate_toc_pdf_final
+from components.parse_cache import PARSE_CACHE
 
 app = Flask(__name__)
 CORS(app)
@@ -51,6 +55,22 @@ def process_excel_route():
 def generate_pdf_route():
     return process_pdf()
 
+@app.route('/api/generate-td-documents', methods=['POST'])
+def generate_td_documents_route():
+    return generate_td_documents()
+
+@app.route('/api/generate-batch', methods=['POST'])
+def generate_batch_route():
+    return generate_batch()
+
+@app.route('/api/verify-tag-data', methods=['POST'])
+def verify_tag_data_route():
+    return verify_tag_data()
+
+@app.route('/api/parse-cache-stats', methods=['GET'])
+def parse_cache_stats_route():
+    return jsonify(PARSE_CACHE.stats())
+
 @app.route('/api/generate-rfid-pdf', methods=['POST'])
 def generate_rdid_pdf_route():
     return generate_pdf_with_rfid_image()
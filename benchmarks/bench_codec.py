@@ -0,0 +1,259 @@
+"""
+Throughput / latency benchmark for the NT, AlineT and AdjT tag encoders.
+
+First checks every golden vector in golden_vectors.json (the sample tags of calculations_nt's
+__main__, the commented main() of calculations_aline and the AdjT tags of the Malwan sample TD)
+against both encode paths, and the incremental re-encoder (calculations.incremental) against a
+full re-encode for every field, then times synthetic populations:
+
+  scalar - generate_pages_for_tag / calculate_values per TagInfo, encode cache disabled
+  batch  - encode_layout_batch over the whole population
+
+Run from the repo root:
+
+    python -m benchmarks.bench_codec --sizes 1000 10000 100000 --compare benchmarks/results/<old>.json
+
+Results go to benchmarks/results/codec_<commit>.json unless --out is given.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+from calculations import calculations_adj, calculations_aline, calculations_nt
+from calculations.batch import encode_layout_batch
+from calculations.bit_layout import get_plan
+from calculations.encode_cache import ENCODE_CACHE
+from calculations.incremental import reencode, reencode_batch
+from calculations.layouts import LAYOUTS
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+GOLDEN_PATH = os.path.join(BENCH_DIR, "golden_vectors.json")
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+DEFAULT_SIZES = (1000, 10000, 100000)
+REENCODE_TAGS = 256
+PERCENTILES = (50, 90, 99)
+
+
+def _encode_aline(tag):
+    result = calculations_aline.calculate_values(tag)
+    return result.page_x, result.page_y, result.crc
+
+
+SCALAR = {
+    'NT': (calculations_nt.taginfo_from_fields, calculations_nt.generate_pages_for_tag),
+    'AlineT': (calculations_aline.taginfo_from_fields, _encode_aline),
+    'AdjT': (calculations_adj.taginfo_from_fields, calculations_adj.generate_pages_for_tag),
+}
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def check_golden(path=GOLDEN_PATH):
+    """
+    Encodes every golden vector through the scalar and batch paths. Returns (checked, failures).
+    """
+    with open(path) as f:
+        golden = json.load(f)
+
+    failures = []
+    checked = 0
+    for layout_name, vectors in golden.items():
+        layout = LAYOUTS[layout_name]
+        build, encode = SCALAR[layout_name]
+        columns = {name: [v["fields"][name] for v in vectors] for name in layout.field_names}
+        batch_x, batch_y, batch_crc = encode_layout_batch(get_plan(layout), columns)
+
+        for i, vector in enumerate(vectors):
+            checked += 1
+            expected = (vector["page_x"], vector["page_y"], vector["crc"])
+            page_x, page_y, crc = encode(build([vector["fields"][name] for name in layout.field_names]))
+            results = {
+                "scalar": (bytes(page_x[:8]).hex(), bytes(page_y[:8]).hex(), f"{crc:08x}"),
+                "batch": (batch_x[i].tobytes().hex(), batch_y[i].tobytes().hex(), f"{int(batch_crc[i]):08x}"),
+            }
+            for path_name, actual in results.items():
+                if actual != expected:
+                    failures.append({"layout": layout_name, "source": vector["source"], "path": path_name,
+                                     "expected": list(expected), "actual": list(actual)})
+    return checked, failures
+
+
+def check_reencode(n=REENCODE_TAGS, seed=0):
+    """
+    Edits every field of every layout on `n` synthetic tags with reencode_batch (and the first
+    tags with reencode, pages as bytes and as hex) and compares pages and CRCs with
+    encode_layout_batch of the edited values. Returns (checked, failures).
+    """
+    failures = []
+    checked = 0
+    for layout_name, layout in LAYOUTS.items():
+        plan = get_plan(layout)
+        columns = synthetic_population(layout, n, seed)
+        page_x, page_y, _ = encode_layout_batch(plan, columns)
+        rng = np.random.default_rng(seed + 1)
+
+        for spec in layout.fields:
+            new_values = rng.integers(0, 1 << spec.width, n, dtype=np.int64)
+            new_values[:2] = (0, (1 << spec.width) - 1)
+            expected_x, expected_y, expected_crc = encode_layout_batch(plan, {**columns, spec.name: new_values})
+            expected = [(expected_x[i].tobytes().hex(), expected_y[i].tobytes().hex(), f"{int(expected_crc[i]):08x}")
+                        for i in range(n)]
+
+            batch_x, batch_y, batch_crc = reencode_batch(layout_name, page_x, page_y, spec.name, new_values)
+            results = {"batch": [(batch_x[i].tobytes().hex(), batch_y[i].tobytes().hex(), f"{int(batch_crc[i]):08x}")
+                                 for i in range(n)]}
+            for i in range(min(n, 8)):
+                x, y = page_x[i].tobytes(), page_y[i].tobytes()
+                if i % 2:
+                    x, y = x.hex(), y.hex()
+                x, y, crc = reencode(layout_name, x, y, {spec.name: int(new_values[i])})
+                results.setdefault("scalar", []).append((x.hex(), y.hex(), f"{crc:08x}"))
+
+            for path_name, actual in results.items():
+                checked += len(actual)
+                for i, (got, want) in enumerate(zip(actual, expected)):
+                    if got != want:
+                        failures.append({"layout": layout_name, "field": spec.name, "path": path_name, "tag": i,
+                                         "expected": list(want), "actual": list(got)})
+                        break
+    return checked, failures
+
+
+def synthetic_population(layout, n, seed=0):
+    """Random in-range values for every field; type and version fields keep their defaults."""
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for spec in layout.fields:
+        if spec.name in ('uctypeofTag', 'uc_version'):
+            columns[spec.name] = np.full(n, spec.default, dtype=np.int64)
+        else:
+            columns[spec.name] = rng.integers(0, 1 << spec.width, n, dtype=np.int64)
+    return columns
+
+
+def _latency_summary(latencies_ns):
+    latencies_us = np.asarray(latencies_ns, dtype=np.float64) / 1000.0
+    summary = {f"p{p}": round(float(np.percentile(latencies_us, p)), 4) for p in PERCENTILES}
+    summary["max"] = round(float(latencies_us.max()), 4)
+    summary["mean"] = round(float(latencies_us.mean()), 4)
+    return summary
+
+
+def bench_scalar(layout, columns, n):
+    build, encode = SCALAR[layout.name]
+    rows = zip(*(columns[name].tolist() for name in layout.field_names))
+    tags = [build(values) for values in rows]
+
+    latencies = np.empty(n, dtype=np.int64)
+    clock = time.perf_counter_ns
+    start = clock()
+    for i, tag in enumerate(tags):
+        t0 = clock()
+        encode(tag)
+        latencies[i] = clock() - t0
+    total = (clock() - start) / 1e9
+    return {"tags_per_sec": round(n / total, 1), "seconds": round(total, 6), "latency_us": _latency_summary(latencies)}
+
+
+def bench_batch(layout, columns, n, repeats=5):
+    plan = get_plan(layout)
+    encode_layout_batch(plan, columns)                     # warm-up
+    runs = []
+    for _ in range(repeats):
+        t0 = time.perf_counter_ns()
+        encode_layout_batch(plan, columns)
+        runs.append(time.perf_counter_ns() - t0)
+    median = float(np.median(runs)) / 1e9
+    per_tag = [r / n for r in runs]
+    return {"tags_per_sec": round(n / median, 1), "seconds": round(median, 6), "repeats": repeats,
+            "latency_us": _latency_summary(per_tag)}
+
+
+def run(sizes=DEFAULT_SIZES, layouts=tuple(LAYOUTS), paths=("scalar", "batch"), seed=0):
+    checked, failures = check_golden()
+    reencoded, reencode_failures = check_reencode(seed=seed)
+    results = []
+
+    cache_size = ENCODE_CACHE.maxsize
+    ENCODE_CACHE.resize(0)
+    try:
+        for layout_name in layouts:
+            layout = LAYOUTS[layout_name]
+            for n in sizes:
+                columns = synthetic_population(layout, n, seed)
+                for path in paths:
+                    timing = bench_scalar(layout, columns, n) if path == "scalar" else bench_batch(layout, columns, n)
+                    results.append({"layout": layout_name, "path": path, "tags": n, **timing})
+                    print(f"{layout_name:7} {path:6} {n:>7} tags  {timing['tags_per_sec']:>14,.0f} tags/s  "
+                          f"p50 {timing['latency_us']['p50']:>9.3f} us  p99 {timing['latency_us']['p99']:>9.3f} us")
+    finally:
+        ENCODE_CACHE.resize(cache_size)
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "seed": seed,
+        },
+        "golden": {"checked": checked, "failures": failures},
+        "reencode": {"checked": reencoded, "failures": reencode_failures},
+        "results": results,
+    }
+
+
+def compare(report, previous):
+    """Prints tags/sec of `report` relative to an earlier report (>1 is faster)."""
+    before = {(r["layout"], r["path"], r["tags"]): r["tags_per_sec"] for r in previous["results"]}
+    print(f"\nCompared with {previous['meta'].get('commit')} ({previous['meta'].get('timestamp')}):")
+    for r in report["results"]:
+        old = before.get((r["layout"], r["path"], r["tags"]))
+        if old:
+            print(f"{r['layout']:7} {r['path']:6} {r['tags']:>7} tags  x{r['tags_per_sec'] / old:.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tag encoder benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument("--layouts", nargs="+", default=list(LAYOUTS), choices=list(LAYOUTS))
+    parser.add_argument("--paths", nargs="+", default=["scalar", "batch"], choices=["scalar", "batch"])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="JSON output path (default benchmarks/results/codec_<commit>.json)")
+    parser.add_argument("--compare", help="earlier JSON report to compare tags/sec against")
+    args = parser.parse_args(argv)
+
+    report = run(args.sizes, args.layouts, args.paths, args.seed)
+
+    out = args.out or os.path.join(RESULTS_DIR, f"codec_{report['meta']['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nGolden vectors: {report['golden']['checked']} checked, {len(report['golden']['failures'])} failed")
+    print(f"Incremental re-encodes: {report['reencode']['checked']} checked, "
+          f"{len(report['reencode']['failures'])} failed")
+    print(f"Results saved: {out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+    return 1 if report["golden"]["failures"] or report["reencode"]["failures"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+"""
+Memory / time benchmark for the formatted TD workbook writers (TD_EXCEL_WRITER).
+
+Builds a synthetic raw TD workbook per size (see bench_ingest.make_td_workbook), parses it into
+sheet models, then measures write_formatted_workbook with the "memory" and "stream" writers:
+build (laying out and styling the cells; a "stream" build also writes the rows) and save times
+without tracemalloc, then the traced peak of a second write (skip it with --no-peak). Models are
+built before the measurement starts, so peaks cover the output side only.
+
+Each measurement runs in a fresh interpreter so peak RSS is its own. tracemalloc peak covers
+Python allocations only (openpyxl's cells and styles, not lxml's buffers).
+
+Run from the repo root:
+
+    python -m benchmarks.bench_excel --columns 500 2000 --compare benchmarks/results/<old>.json
+
+Results go to benchmarks/results/excel_<commit>.json unless --out is given.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import openpyxl
+
+from benchmarks.bench_codec import git_commit
+from benchmarks.bench_ingest import make_td_workbook, resource
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+DEFAULT_COLUMNS = (500, 2000)
+WRITERS = ("memory", "stream")
+
+
+def _run_case(writer, path, out_path, peak=True):
+    # Imported here so module import cost is not part of the measurement
+    from components.parse_cache import PARSE_CACHE
+    from file_generators.tag_data_excel_formatted_generator import build_formatted_workbook, write_formatted_workbook
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        sheets = list(PARSE_CACHE.sheet_models(path))
+        for _, _, model in sheets:
+            if model is not None:
+                model.to_frame()
+        # Timed without tracemalloc, which slows openpyxl down several times over
+        t0 = time.perf_counter()
+        wb, written = build_formatted_workbook(sheets, writer)
+        t1 = time.perf_counter()
+        wb.save(out_path)
+        t2 = time.perf_counter()
+        del wb
+
+        traced_peak = None
+        if peak:
+            tracemalloc.start()
+            write_formatted_workbook(sheets, out_path, writer)
+            traced_peak = round(tracemalloc.get_traced_memory()[1] / 2**20, 2)
+            tracemalloc.stop()
+
+    maxrss = None
+    if resource is not None:
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if sys.platform != "darwin":
+            maxrss *= 1024      # KiB on Linux
+    return {"seconds": round(t2 - t0, 4), "build_seconds": round(t1 - t0, 4), "save_seconds": round(t2 - t1, 4),
+            "traced_peak_mb": traced_peak, "max_rss_mb": None if maxrss is None else round(maxrss / 2**20, 2),
+            "output_mb": round(os.path.getsize(out_path) / 2**20, 2), "sheets": written}
+
+
+def measure(writer, path, out_path, peak=True):
+    """Runs one writer in a child interpreter and returns its measurements."""
+    args = ["--run", writer, path, out_path] + ([] if peak else ["--no-peak"])
+    out = subprocess.run([sys.executable, "-m", "benchmarks.bench_excel"] + args,
+                         cwd=os.path.dirname(BENCH_DIR), capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def run(columns=DEFAULT_COLUMNS, writers=WRITERS, seed=0, peak=True):
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in columns:
+            path = os.path.join(tmp, f"TD_bench_{n}.xlsx")
+            tags = make_td_workbook(path, n, seed)
+            for writer in writers:
+                timing = measure(writer, path, os.path.join(tmp, f"TD_bench_{n}_{writer}_formatted.xlsx"), peak)
+                results.append({"writer": writer, "tag_columns": tags, **timing})
+                rss = "-" if timing["max_rss_mb"] is None else f"{timing['max_rss_mb']:.1f}"
+                traced = "-" if timing["traced_peak_mb"] is None else f"{timing['traced_peak_mb']:.1f}"
+                print(f"{writer:6} {tags:>6} cols  {timing['seconds']:>8.3f} s (build {timing['build_seconds']:.3f}, "
+                      f"save {timing['save_seconds']:.3f})  traced peak {traced:>7} MB  max rss {rss:>7} MB  "
+                      f"output {timing['output_mb']:.2f} MB")
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "openpyxl": openpyxl.__version__,
+            "platform": platform.platform(),
+            "seed": seed,
+        },
+        "results": results,
+    }
+
+
+def compare(report, previous):
+    """Prints times and traced peak of `report` relative to an earlier report (<1 is better)."""
+    key = lambda r: (r["writer"], r["tag_columns"])
+    ratio = lambda new, old, field: f"x{new[field] / old[field]:.2f}" if new.get(field) and old.get(field) else "-"
+    before = {key(r): r for r in previous["results"]}
+    print(f"\nCompared with {previous['meta'].get('commit')} ({previous['meta'].get('timestamp')}):")
+    for r in report["results"]:
+        old = before.get(key(r))
+        if old:
+            print(f"{r['writer']:6} {r['tag_columns']:>6} cols  time {ratio(r, old, 'seconds')}  "
+                  f"build {ratio(r, old, 'build_seconds')}  save {ratio(r, old, 'save_seconds')}  "
+                  f"peak {ratio(r, old, 'traced_peak_mb')}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Formatted TD workbook writer benchmark")
+    parser.add_argument("--columns", type=int, nargs="+", default=list(DEFAULT_COLUMNS),
+                        help="tag columns per sheet")
+    parser.add_argument("--writers", nargs="+", default=list(WRITERS), choices=list(WRITERS))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="JSON output path (default benchmarks/results/excel_<commit>.json)")
+    parser.add_argument("--compare", help="earlier JSON report to compare against")
+    parser.add_argument("--no-peak", action="store_true", help="skip the (slow) tracemalloc pass")
+    parser.add_argument("--run", nargs=3, metavar=("WRITER", "PATH", "OUT"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run:
+        print(json.dumps(_run_case(*args.run, peak=not args.no_peak)))
+        return 0
+
+    report = run(args.columns, args.writers, args.seed, not args.no_peak)
+
+    out = args.out or os.path.join(RESULTS_DIR, f"excel_{report['meta']['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults saved: {out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,187 @@
+"""
+Memory / time benchmark for the TD workbook readers (TD_READER_BACKEND).
+
+Builds a synthetic raw TD workbook per size (NT, AlineT and AdjT sheets with the layout row
+labels and `columns` tag columns each) and measures, for the "pandas" and "stream" backends:
+
+  ingest - iter_td_sheets, one sheet at a time, as process_workbook_sheets reads it
+  ranges - extract_tag_and_tin_ranges (footer tables), one scan pass per sheet
+
+Each measurement runs in a fresh interpreter so peak RSS is its own. tracemalloc peak covers
+Python / numpy allocations only (not lxml's parser buffers).
+
+Run from the repo root:
+
+    python -m benchmarks.bench_ingest --columns 1000 4000 --compare benchmarks/results/<old>.json
+
+For the range scanner on wide workbooks:
+
+    python -m benchmarks.bench_ingest --cases ranges --columns 2000 8000
+
+Results go to benchmarks/results/ingest_<commit>.json unless --out is given.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+from benchmarks.bench_codec import git_commit, synthetic_population
+from calculations.layouts import LAYOUTS
+from components.workbook_ingest import READER_BACKENDS
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+DEFAULT_COLUMNS = (1000, 4000)
+CASES = ("ingest", "ranges")
+TITLES = {'NT': 'NORMAL TAGS', 'AlineT': 'ADJACENT LINE TAGS', 'AdjT': 'ADJACENT TAGS'}
+
+try:
+    import resource
+except ImportError:         # Windows
+    resource = None
+
+
+def make_td_workbook(path, columns, seed=0):
+    """
+    Raw TD input in the shape the generators read: title row, header row, one row per layout
+    field. Tag columns come in M/D pairs numbered from 1000, so `columns` is capped at 18000.
+    """
+    pairs = min(columns, 18000) // 2
+    tag_names = [f"{1000 + i // 2}/{'MD'[i % 2]}" for i in range(pairs * 2)]
+    wb = Workbook(write_only=True)
+    for layout_name, layout in LAYOUTS.items():
+        ws = wb.create_sheet(layout_name)
+        values = synthetic_population(layout, len(tag_names), seed)
+        ws.append([TITLES.get(layout_name, layout_name)])
+        ws.append(['FIELD NAME / DESCRIPTION', 'BIT POSITION', 'Size (Bits)'] + tag_names)
+        for spec in layout.fields:
+            ws.append([spec.label, spec.bit_position, spec.width] + values[spec.name].tolist())
+    wb.save(path)
+    return len(tag_names)
+
+
+def _run_case(case, backend, path):
+    # Imported here so module import cost is not part of the measurement
+    from components.bottom_left_tables import extract_tag_and_tin_ranges
+    from components.workbook_ingest import iter_td_sheets
+
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        if case == "ingest":
+            cells = 0
+            for sheet in iter_td_sheets(path, backend=backend):
+                cells += sheet.df.size
+            result = cells
+        else:
+            result = sum(len(v) for v in extract_tag_and_tin_ranges(path, backend))
+    seconds = time.perf_counter() - t0
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    maxrss = None
+    if resource is not None:
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if sys.platform != "darwin":
+            maxrss *= 1024      # KiB on Linux
+    return {"seconds": round(seconds, 4), "traced_peak_mb": round(peak / 2**20, 2),
+            "max_rss_mb": None if maxrss is None else round(maxrss / 2**20, 2), "check": result}
+
+
+def measure(case, backend, path):
+    """Runs one case in a child interpreter and returns its measurements."""
+    out = subprocess.run([sys.executable, "-m", "benchmarks.bench_ingest", "--run", case, backend, path],
+                         cwd=os.path.dirname(BENCH_DIR), capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def run(columns=DEFAULT_COLUMNS, backends=READER_BACKENDS, cases=CASES, seed=0):
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in columns:
+            path = os.path.join(tmp, f"TD_bench_{n}.xlsx")
+            tags = make_td_workbook(path, n, seed)
+            size_mb = os.path.getsize(path) / 2**20
+            for case in cases:
+                checks = set()
+                for backend in backends:
+                    timing = measure(case, backend, path)
+                    checks.add(timing.pop("check"))
+                    results.append({"case": case, "backend": backend, "tag_columns": tags,
+                                    "file_mb": round(size_mb, 2), **timing})
+                    rss = "-" if timing["max_rss_mb"] is None else f"{timing['max_rss_mb']:.1f}"
+                    print(f"{case:6} {backend:6} {tags:>6} cols  {timing['seconds']:>8.3f} s  "
+                          f"traced peak {timing['traced_peak_mb']:>8.1f} MB  max rss {rss:>7} MB")
+                if len(checks) > 1:
+                    raise RuntimeError(f"{case}: backends disagree on {path}")
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "seed": seed,
+        },
+        "results": results,
+    }
+
+
+def compare(report, previous):
+    """Prints seconds and traced peak of `report` relative to an earlier report (<1 is better)."""
+    key = lambda r: (r["case"], r["backend"], r["tag_columns"])
+    before = {key(r): r for r in previous["results"]}
+    print(f"\nCompared with {previous['meta'].get('commit')} ({previous['meta'].get('timestamp')}):")
+    for r in report["results"]:
+        old = before.get(key(r))
+        if old and old["seconds"] and old["traced_peak_mb"]:
+            print(f"{r['case']:6} {r['backend']:6} {r['tag_columns']:>6} cols  time x{r['seconds'] / old['seconds']:.2f}  "
+                  f"peak x{r['traced_peak_mb'] / old['traced_peak_mb']:.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="TD workbook reader benchmark")
+    parser.add_argument("--columns", type=int, nargs="+", default=list(DEFAULT_COLUMNS),
+                        help="tag columns per sheet")
+    parser.add_argument("--backends", nargs="+", default=list(READER_BACKENDS), choices=list(READER_BACKENDS))
+    parser.add_argument("--cases", nargs="+", default=list(CASES), choices=list(CASES))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="JSON output path (default benchmarks/results/ingest_<commit>.json)")
+    parser.add_argument("--compare", help="earlier JSON report to compare against")
+    parser.add_argument("--run", nargs=3, metavar=("CASE", "BACKEND", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run:
+        print(json.dumps(_run_case(*args.run)))
+        return 0
+
+    report = run(args.columns, args.backends, args.cases, args.seed)
+
+    out = args.out or os.path.join(RESULTS_DIR, f"ingest_{report['meta']['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults saved: {out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+"""
+Vectorized NumPy encoders for whole tag sheets.
+
+Each encoder takes a mapping of field name -> integer array (one entry per tag column, names
+as declared in calculations.layouts) and returns `uint8[N, 8]` page X, `uint8[N, 8]` page Y
+and `uint32[N]` CRC arrays that are byte-for-byte identical to the scalar encoders in
+calculations_nt / _adj / _aline.
+
+Pages are built as one 64-bit word each by the layout's PackingPlan, where bit n of the word
+is the spec's Xn / Yn (page byte 0 holds X63 - X56). The CRC-30 input is X7..X0 followed by
+Y7..Y3, i.e. the eight bytes of X least-significant first and then the five low bytes of Y.
+They do not go through calculations.encode_cache (see there).
+"""
+import hashlib
+from functools import lru_cache
+
+import numpy as np
+
+from calculations import crc30
+from calculations.bit_layout import get_plan
+from calculations.layouts import LAYOUTS, NT_PLAN, ALINE_PLAN, ADJ_PLAN
+
+CRC_TABLE = np.array(crc30.CRC_TABLE, dtype=np.uint32)
+CODEC_VERSION = 1           # bump when encoded output changes without a layout or CRC parameter change
+
+
+@lru_cache(maxsize=None)
+def codec_fingerprint() -> str:
+    """
+    Digest of what decides the encoded pages and CRCs: CODEC_VERSION, the packing plans of
+    LAYOUTS and the CRC-30 parameters. Stored with encoded output kept on disk (tag sidecars,
+    batch run manifests) so that output is not reused after an encoder change.
+    """
+    codec = (CODEC_VERSION, crc30.order, crc30.polynom, crc30.crcinit, crc30.crcxor, crc30.CRC_TABLE,
+             [get_plan(layout) for layout in LAYOUTS.values()])
+    return hashlib.blake2b(repr(codec).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _tag_count(fields):
+    lengths = {len(np.asarray(v).reshape(-1)) for v in fields.values()}
+    if len(lengths) > 1:
+        raise ValueError(f"Field arrays have different lengths: {sorted(lengths)}")
+    return lengths.pop() if lengths else 0
+
+
+def words_to_pages(words):
+    """uint64[N] page words -> uint8[N, 8] page bytes (big-endian, as written in the sheet)."""
+    return np.ascontiguousarray(words, dtype='>u8').view(np.uint8).reshape(-1, 8)
+
+
+def pages_to_words(pages):
+    """uint8[N, 8] page bytes -> uint64[N] page words."""
+    pages = np.ascontiguousarray(pages, dtype=np.uint8).reshape(-1, 8)
+    return pages.view('>u8').reshape(-1).astype(np.uint64)
+
+
+def crc_batch(page_x_words, page_y_words):
+    """
+    CRC-30/CDMA of every tag's 13-byte payload, one table lookup per byte column.
+    """
+    x = np.asarray(page_x_words, dtype=np.uint64)
+    y = np.asarray(page_y_words, dtype=np.uint64)
+    message = np.empty((len(x), 13), dtype=np.uint8)
+    message[:, :8] = x.astype('<u8').view(np.uint8).reshape(-1, 8)
+    message[:, 8:] = y.astype('<u8').view(np.uint8).reshape(-1, 8)[:, :5]
+
+    mask = np.uint32(crc30.crcmask)
+    shift = np.uint32(crc30.order - 8)
+    crc = np.full(len(x), crc30.crcinit, dtype=np.uint32)
+    for i in range(13):
+        crc = ((crc << np.uint32(8)) & mask) ^ CRC_TABLE[(crc >> shift) ^ message[:, i]]
+    return (crc ^ np.uint32(crc30.crcxor)) & mask
+
+
+def encode_layout_batch(plan, fields):
+    """
+    Encodes every tag described by `fields` with a compiled PackingPlan.
+    """
+    n = _tag_count(fields)
+    x, y = plan.pack_batch(fields, n)
+    crc = crc_batch(x, y)
+    y = y | (crc.astype(np.uint64) << np.uint64(plan.layout.crc_bits.lsb))
+    return words_to_pages(x), words_to_pages(y), crc
+
+
+def encode_nt_batch(fields):
+    return encode_layout_batch(NT_PLAN, fields)
+
+
+def encode_aline_batch(fields):
+    return encode_layout_batch(ALINE_PLAN, fields)
+
+
+def encode_adj_batch(fields):
+    return encode_layout_batch(ADJ_PLAN, fields)
+
+
+def encode_batch(sheet_name, fields):
+    """
+    Encodes every tag of a sheet. Returns (page_x uint8[N, 8], page_y uint8[N, 8], crc uint32[N]).
+    """
+    if sheet_name not in LAYOUTS:
+        raise ValueError(f"No batch encoder for sheet {sheet_name}")
+    return encode_layout_batch(get_plan(LAYOUTS[sheet_name]), fields)
+
+
+def format_pages(pages, trim_zeros=False):
+    """
+    Hex strings for each row of `pages`. With `trim_zeros`, trailing 00 bytes are dropped down
+    to six bytes, matching format_page() in the NT / AdjT sheet processing.
+    """
+    pages = np.ascontiguousarray(pages, dtype=np.uint8)
+    hex_all = pages.tobytes().hex()
+    out = [hex_all[i * 16:(i + 1) * 16] for i in range(len(pages))]
+    if trim_zeros:
+        out = [_trim_page_hex(h) for h in out]
+    return out
+
+
+def _trim_page_hex(h):
+    while len(h) > 12 and h.endswith('00'):
+        h = h[:-2]
+    return h
+
+
+def format_crcs(crc):
+    return [f"{c:08x}" for c in np.asarray(crc).tolist()]
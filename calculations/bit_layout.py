@@ -0,0 +1,207 @@
+"""
+Declarative RFID tag bit layouts and the compiler that turns them into packing plans.
+
+A layout lists every field once, with its bit position written the same way as the
+"BIT POSITION" column of the TD sheets ("X38 - X16", "Y6 - Y0 & X63 - X55", ...).
+compile_layout() turns that into precomputed (field, value shift, mask, page shift)
+operations on one 64-bit word per page, so encoding a tag is a handful of integer ORs.
+
+Bit n of a page word is the spec's Xn / Yn; page byte 0 holds bits 63 - 56.
+"""
+import re
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+PAGES = ('X', 'Y')
+PAGE_BITS = 64
+
+_RANGE_RE = re.compile(r"^\s*([XY])(\d+)\s*(?:-\s*([XY])(\d+))?\s*$", re.IGNORECASE)
+
+
+@dataclass(frozen=True)
+class BitRange:
+    page: str
+    msb: int
+    lsb: int
+
+    @property
+    def width(self) -> int:
+        return self.msb - self.lsb + 1
+
+    def __str__(self):
+        if self.msb == self.lsb:
+            return f"{self.page}{self.msb}"
+        return f"{self.page}{self.msb} - {self.page}{self.lsb}"
+
+
+def parse_bit_position(text: str) -> Tuple[BitRange, ...]:
+    """
+    Parses "Y6 - Y0 & X63 - X55" into BitRanges, most significant part of the value first.
+    """
+    ranges = []
+    for part in str(text).split('&'):
+        match = _RANGE_RE.match(part)
+        if not match:
+            raise ValueError(f"Invalid bit position: {text!r}")
+        page, msb, page_lo, lsb = match.groups()
+        page = page.upper()
+        if page_lo and page_lo.upper() != page:
+            raise ValueError(f"Bit range crosses pages: {part.strip()!r}")
+        msb = int(msb)
+        lsb = int(lsb) if lsb is not None else msb
+        if not 0 <= lsb <= msb < PAGE_BITS:
+            raise ValueError(f"Invalid bit range: {part.strip()!r}")
+        ranges.append(BitRange(page, msb, lsb))
+    return tuple(ranges)
+
+
+@dataclass(frozen=True)
+class FieldSpec:
+    name: str
+    bits: Tuple[BitRange, ...]
+    default: int = 0
+    label: Optional[str] = None     # row label in the TD sheet
+
+    @property
+    def width(self) -> int:
+        return sum(r.width for r in self.bits)
+
+    @property
+    def bit_position(self) -> str:
+        return " & ".join(str(r) for r in self.bits)
+
+
+def bit_field(name: str, bit_position: str, default: int = 0, label: str = None) -> FieldSpec:
+    return FieldSpec(name, parse_bit_position(bit_position), default, label)
+
+
+@dataclass(frozen=True)
+class TagLayout:
+    """
+    One tag type / spec version. `fields` are in TagInfo order; CRC goes in `crc_bits`
+    and is computed over all of page X and the Y bits below it.
+    """
+    name: str
+    version: str
+    fields: Tuple[FieldSpec, ...]
+    crc_bits: BitRange = BitRange('Y', 63, 34)
+    trim_zeros: bool = False
+
+    @property
+    def field_names(self) -> Tuple[str, ...]:
+        return tuple(f.name for f in self.fields)
+
+    @property
+    def labels(self) -> Dict[str, str]:
+        """Field name -> TD sheet row label."""
+        return {f.name: f.label for f in self.fields if f.label}
+
+
+@dataclass(frozen=True)
+class PackingPlan:
+    layout: TagLayout
+    field_names: Tuple[str, ...]
+    defaults: Tuple[int, ...]
+    # (field index, value shift, mask, page shift) per page
+    x_ops: Tuple[Tuple[int, int, int, int], ...]
+    y_ops: Tuple[Tuple[int, int, int, int], ...]
+    index: Dict[str, int] = field(repr=False, compare=False)
+
+    def pack(self, values: Sequence[int]) -> Tuple[int, int]:
+        """
+        Packs one tag (values in field_names order) into its (X, Y) page words, CRC bits zero.
+        """
+        x = 0
+        for i, vshift, mask, shift in self.x_ops:
+            x |= ((values[i] >> vshift) & mask) << shift
+        y = 0
+        for i, vshift, mask, shift in self.y_ops:
+            y |= ((values[i] >> vshift) & mask) << shift
+        return x, y
+
+    def unpack(self, x: int, y: int) -> Tuple[int, ...]:
+        values = [0] * len(self.field_names)
+        for ops, word in ((self.x_ops, x), (self.y_ops, y)):
+            for i, vshift, mask, shift in ops:
+                values[i] |= ((word >> shift) & mask) << vshift
+        return tuple(values)
+
+    def values_from_mapping(self, fields: Mapping[str, int]) -> Tuple[int, ...]:
+        return tuple(int(fields.get(name, default)) for name, default in zip(self.field_names, self.defaults))
+
+    def pack_batch(self, columns: Mapping[str, Sequence[int]], n: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Vectorized pack: one int array per field name (missing fields use their default).
+        Returns uint64[n] X and Y words.
+        """
+        words = {'X': np.zeros(n, dtype=np.uint64), 'Y': np.zeros(n, dtype=np.uint64)}
+        arrays = {}
+        for page, ops in (('X', self.x_ops), ('Y', self.y_ops)):
+            word = words[page]
+            for i, vshift, mask, shift in ops:
+                name = self.field_names[i]
+                if name not in arrays:
+                    if name in columns:
+                        values = np.asarray(columns[name], dtype=np.int64).reshape(-1)
+                        if len(values) != n:
+                            raise ValueError(f"Field {name} has {len(values)} values, expected {n}")
+                    else:
+                        values = np.full(n, self.defaults[i], dtype=np.int64)
+                    arrays[name] = values
+                part = (arrays[name] >> vshift) & mask
+                word |= part.astype(np.uint64) << np.uint64(shift)
+        return words['X'], words['Y']
+
+    def unpack_batch(self, x: np.ndarray, y: np.ndarray) -> Dict[str, np.ndarray]:
+        x = np.asarray(x, dtype=np.uint64)
+        y = np.asarray(y, dtype=np.uint64)
+        out = {name: np.zeros(len(x), dtype=np.int64) for name in self.field_names}
+        for ops, word in ((self.x_ops, x), (self.y_ops, y)):
+            for i, vshift, mask, shift in ops:
+                part = (word >> np.uint64(shift)) & np.uint64(mask)
+                out[self.field_names[i]] |= part.astype(np.int64) << vshift
+        return out
+
+
+def compile_layout(layout: TagLayout) -> PackingPlan:
+    """
+    Validates `layout` (no overlapping bits, nothing under the CRC) and precomputes its ops.
+    """
+    used = {'X': 0, 'Y': 0}
+    crc = layout.crc_bits
+    used[crc.page] |= ((1 << crc.width) - 1) << crc.lsb
+    ops = {'X': [], 'Y': []}
+
+    names = layout.field_names
+    if len(set(names)) != len(names):
+        raise ValueError(f"Duplicate field names in layout {layout.name}")
+
+    for index, spec in enumerate(layout.fields):
+        vshift = 0
+        for r in reversed(spec.bits):           # least significant part of the value first
+            if r.page not in PAGES:
+                raise ValueError(f"Unknown page {r.page!r} for field {spec.name}")
+            mask = (1 << r.width) - 1
+            bits = mask << r.lsb
+            if used[r.page] & bits:
+                raise ValueError(f"Field {spec.name} overlaps another field at {r}")
+            used[r.page] |= bits
+            ops[r.page].append((index, vshift, mask, r.lsb))
+            vshift += r.width
+
+    return PackingPlan(
+        layout=layout,
+        field_names=names,
+        defaults=tuple(f.default for f in layout.fields),
+        x_ops=tuple(ops['X']),
+        y_ops=tuple(ops['Y']),
+        index={name: i for i, name in enumerate(names)},
+    )
+
+
+@lru_cache(maxsize=None)
+def get_plan(layout: TagLayout) -> PackingPlan:
+    return compile_layout(layout)
@@ -0,0 +1,86 @@
+from dataclasses import dataclass, field
+from typing import Callable, Tuple
+
+from calculations import crc30
+
+
+@dataclass(frozen=True)
+class TagCodec:
+    """
+    Immutable tag encoder: packs a tag into page X / page Y and stamps the CRC-30 into Y63 - Y34.
+
+    All CRC parameters (lookup table, direct/non-direct init values) are computed once in
+    __post_init__ and never written again, so one instance can be shared by threaded Flask
+    workers and pickled to a process pool. `pack` must be a module-level function returning
+    the two page bytearrays for a tag.
+    """
+    pack: Callable[[object], Tuple[bytearray, bytearray]]
+    order: int = crc30.order
+    polynom: int = crc30.polynom
+    crcinit: int = crc30.crcinit
+    crcxor: int = crc30.crcxor
+    direct: int = 1
+
+    crcmask: int = field(init=False, repr=False)
+    crchighbit: int = field(init=False, repr=False)
+    crcinit_direct: int = field(init=False, repr=False)
+    crcinit_nondirect: int = field(init=False, repr=False)
+    crctab: tuple = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        crcmask = (((1 << (self.order - 1)) - 1) << 1) | 1
+        crchighbit = 1 << (self.order - 1)
+        if self.polynom & ~crcmask or self.crcinit & ~crcmask or self.crcxor & ~crcmask:
+            raise ValueError("CRC parameters are invalid")
+
+        if not self.direct:
+            crc = self.crcinit
+            for _ in range(self.order):
+                bit = crc & crchighbit
+                crc <<= 1
+                if bit:
+                    crc ^= self.polynom
+            crcinit_direct = crc & crcmask
+            crcinit_nondirect = self.crcinit
+        else:
+            crc = self.crcinit
+            for _ in range(self.order):
+                bit = crc & 1
+                crc >>= 1
+                if bit:
+                    crc ^= self.polynom
+                    crc |= crchighbit
+            crcinit_nondirect = crc
+            crcinit_direct = self.crcinit
+
+        if (self.order, self.polynom) == (crc30.order, crc30.polynom):
+            crctab = crc30.CRC_TABLE
+        else:
+            crctab = crc30.build_crc_table(self.order, self.polynom)
+
+        object.__setattr__(self, "crcmask", crcmask)
+        object.__setattr__(self, "crchighbit", crchighbit)
+        object.__setattr__(self, "crcinit_direct", crcinit_direct)
+        object.__setattr__(self, "crcinit_nondirect", crcinit_nondirect)
+        object.__setattr__(self, "crctab", crctab)
+
+    def checksum(self, data, length: int = None) -> int:
+        return crc30.crc30(data, length, self.crctab, self.crcinit_direct, self.crcxor, self.order)
+
+    def encode(self, tag):
+        """
+        Returns (page_x, page_y, crc) for `tag`. Every call works on fresh buffers.
+        """
+        page1, page2 = self.pack(tag)
+
+        # CRC input is X7..X0 followed by Y7..Y3 (the 13 bytes below the CRC field)
+        total_pages = bytes(page1[7::-1]) + bytes(page2[7:2:-1])
+
+        crc = self.checksum(total_pages, 13)
+
+        # Same as InsertBits(0, 30, page2, 0, crc): Y63 - Y34
+        shift = 32 - self.order
+        word = int.from_bytes(page2[0:4], "big") & ((1 << shift) - 1)
+        page2[0:4] = (word | (crc << shift)).to_bytes(4, "big")
+
+        return page1, page2, crc
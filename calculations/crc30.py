@@ -0,0 +1,51 @@
+"""
+Shared CRC-30/CDMA engine used by the NT, AdjT and AlineT tag encoders.
+
+The 256-entry lookup table is built once at import, so every tag is hashed
+one byte at a time instead of one bit at a time.
+"""
+
+# CRC constants
+order = 30
+polynom = 0x2030B9C7
+crcinit = 0x3FFFFFFF
+crcxor = 0x3FFFFFFF
+
+crcmask = (((1 << (order - 1)) - 1) << 1) | 1
+crchighbit = 1 << (order - 1)
+
+
+def build_crc_table(order: int = order, polynom: int = polynom) -> tuple:
+    """
+    Returns the byte-at-a-time lookup table for a non-reflected CRC of the given width.
+    """
+    mask = (1 << order) - 1
+    highbit = 1 << (order - 1)
+    table = []
+    for i in range(256):
+        crc = i << (order - 8)
+        for _ in range(8):
+            if crc & highbit:
+                crc = (crc << 1) ^ polynom
+            else:
+                crc <<= 1
+        table.append(crc & mask)
+    return tuple(table)
+
+
+CRC_TABLE = build_crc_table()
+
+
+def crc30(data, length: int = None, table: tuple = CRC_TABLE, init: int = crcinit, xor: int = crcxor,
+          width: int = order) -> int:
+    """
+    Returns the CRC-30/CDMA of the first `length` bytes of `data` (all of it by default).
+    `table`, `init`, `xor` and `width` select another non-reflected CRC (see TagCodec).
+    """
+    mask = (1 << width) - 1
+    shift = width - 8
+    crc = init
+    # The register never exceeds `width` bits, so `crc >> shift` is already a byte index.
+    for byte in data[:length]:
+        crc = ((crc << 8) & mask) ^ table[(crc >> shift) ^ byte]
+    return (crc ^ xor) & mask
@@ -0,0 +1,182 @@
+"""
+Decoding of PAGE -X / PAGE -Y hex back into tag fields, and vectorized CRC / field verification.
+"""
+from typing import Dict, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+from calculations import calculations_adj, calculations_aline, calculations_nt
+from calculations.batch import crc_batch, encode_layout_batch, pages_to_words
+from calculations.bit_layout import get_plan
+from calculations.layouts import LAYOUTS
+from calculations.tag_batch import TagBatch
+
+TAGINFO_BUILDERS = {
+    'NT': calculations_nt.taginfo_from_fields,
+    'AlineT': calculations_aline.taginfo_from_fields,
+    'AdjT': calculations_adj.taginfo_from_fields,
+}
+
+TAGINFO_FIELDS = {
+    'NT': calculations_nt.taginfo_fields,
+    'AlineT': calculations_aline.taginfo_fields,
+    'AdjT': calculations_adj.taginfo_fields,
+}
+
+_HEX_DIGITS = set("0123456789abcdef")
+
+
+def _clean_hex(value, digits):
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    text = str(value).strip().lower().replace(" ", "")
+    if text.startswith("0x"):
+        text = text[2:]
+    if not text or len(text) > digits or not set(text) <= _HEX_DIGITS:
+        return None
+    return text
+
+
+def parse_page_hex(values: Sequence) -> (np.ndarray, np.ndarray):
+    """
+    Page hex strings -> (uint8[N, 8], valid bool[N]). Pages written with trailing 00 bytes
+    trimmed (NT / AdjT sheets) are padded back to 8 bytes; unparseable cells are zero and invalid.
+    """
+    cleaned = [_clean_hex(v, 16) for v in values]
+    valid = np.array([c is not None and len(c) % 2 == 0 for c in cleaned], dtype=bool)
+    joined = "".join(c.ljust(16, "0") if ok else "0" * 16 for c, ok in zip(cleaned, valid))
+    pages = np.frombuffer(bytes.fromhex(joined), dtype=np.uint8).reshape(-1, 8).copy()
+    return pages, valid
+
+
+def parse_crc_hex(values: Sequence) -> (np.ndarray, np.ndarray):
+    cleaned = [_clean_hex(v, 8) for v in values]
+    valid = np.array([c is not None for c in cleaned], dtype=bool)
+    crc = np.array([int(c, 16) if c is not None else 0 for c in cleaned], dtype=np.uint32)
+    return crc, valid
+
+
+def _as_words(pages):
+    if not isinstance(pages, np.ndarray):
+        pages, _ = parse_page_hex(pages)
+    return pages_to_words(np.asarray(pages, dtype=np.uint8))
+
+
+def decode_pages(layout_name: str, page_x, page_y) -> Dict[str, np.ndarray]:
+    """
+    Field name -> int64[N] for every tag, from page arrays (uint8[N, 8]) or page hex strings.
+    """
+    plan = get_plan(LAYOUTS[layout_name])
+    return plan.unpack_batch(_as_words(page_x), _as_words(page_y))
+
+
+def stored_crc(layout_name: str, page_y) -> np.ndarray:
+    """CRC carried inside page Y (Y63 - Y34)."""
+    crc_bits = LAYOUTS[layout_name].crc_bits
+    y = _as_words(page_y)
+    return ((y >> np.uint64(crc_bits.lsb)) & np.uint64((1 << crc_bits.width) - 1)).astype(np.uint32)
+
+
+def computed_crc(layout_name: str, page_x, page_y) -> np.ndarray:
+    """CRC recomputed from the page payload, ignoring whatever is stored in Y63 - Y34."""
+    crc_bits = LAYOUTS[layout_name].crc_bits
+    y = _as_words(page_y) & ~np.uint64(((1 << crc_bits.width) - 1) << crc_bits.lsb)
+    return crc_batch(_as_words(page_x), y)
+
+
+def decode_batch(layout_name: str, page_x, page_y, tag_names: Sequence[str] = None) -> TagBatch:
+    return TagBatch(LAYOUTS[layout_name], decode_pages(layout_name, page_x, page_y), tag_names)
+
+
+def decode_taginfos(layout_name: str, page_x, page_y) -> List:
+    """
+    TagInfo objects (of the layout's calculations module) decoded from the pages.
+    """
+    return decode_batch(layout_name, page_x, page_y).to_taginfos()
+
+
+def decode_taginfo(layout_name: str, page_x_hex: str, page_y_hex: str):
+    return decode_taginfos(layout_name, [page_x_hex], [page_y_hex])[0]
+
+
+def field_values_to_int(values: Sequence) -> (np.ndarray, np.ndarray):
+    """
+    Sheet cells -> (int64[N], valid bool[N]). 'UNKNOWN' counts as 0, as in process_input_sheet.
+    """
+    series = pd.Series(list(values), dtype=object)
+    series = series.where(series.astype(str).str.strip().str.upper() != 'UNKNOWN', 0)
+    numeric = pd.to_numeric(series, errors='coerce')
+    valid = numeric.notna().to_numpy() & (numeric.fillna(0) % 1 == 0).to_numpy()
+    return numeric.where(valid, 0).to_numpy(dtype=np.int64), valid
+
+
+def verify_tags(layout_name: str, tag_names: Sequence[str], fields: Dict[str, Sequence],
+                page_x: Sequence, page_y: Sequence, crc: Sequence) -> List[dict]:
+    """
+    Checks a set of tags against their sheet rows. `fields` maps field name -> raw cell values
+    (or is a TagBatch), `page_x` / `page_y` / `crc` are the hex cells. Returns one dict per mismatch.
+    """
+    if isinstance(fields, TagBatch):
+        fields = fields.columns
+    layout = LAYOUTS[layout_name]
+    plan = get_plan(layout)
+    n = len(tag_names)
+    mismatches = []
+
+    def report(indices, kind, expected, actual, field=None):
+        for i in np.flatnonzero(indices).tolist():
+            entry = {"tag": str(tag_names[i]), "check": kind,
+                     "expected": expected(i), "actual": actual(i)}
+            if field is not None:
+                entry["field"] = field
+            mismatches.append(entry)
+
+    field_values = {}
+    field_ok = np.ones(n, dtype=bool)
+    for name in plan.field_names:
+        if name not in fields:
+            continue
+        values, valid = field_values_to_int(fields[name])
+        field_values[name] = values
+        report(~valid, "invalid field value", lambda i: "integer",
+               lambda i, raw=fields[name]: str(raw[i]), field=layout.labels.get(name, name))
+        field_ok &= valid
+
+    x_pages, x_ok = parse_page_hex(page_x)
+    y_pages, y_ok = parse_page_hex(page_y)
+    crc_cells, crc_ok = parse_crc_hex(crc)
+    report(~x_ok, "invalid PAGE -X", lambda i: "hex", lambda i: str(page_x[i]))
+    report(~y_ok, "invalid PAGE -Y", lambda i: "hex", lambda i: str(page_y[i]))
+    report(~crc_ok, "invalid CRC", lambda i: "hex", lambda i: str(crc[i]))
+
+    # Pages must carry a CRC that matches their own payload
+    inside = stored_crc(layout_name, y_pages)
+    recomputed = computed_crc(layout_name, x_pages, y_pages)
+    report(x_ok & y_ok & (inside != recomputed), "page CRC",
+           lambda i: f"{int(recomputed[i]):08x}", lambda i: f"{int(inside[i]):08x}")
+    report(y_ok & crc_ok & (inside != crc_cells), "CRC row",
+           lambda i: f"{int(inside[i]):08x}", lambda i: f"{int(crc_cells[i]):08x}")
+
+    # Field rows must decode out of the pages
+    decoded = plan.unpack_batch(pages_to_words(x_pages), pages_to_words(y_pages))
+    pages_ok = x_ok & y_ok
+    for index, name in enumerate(plan.field_names):
+        if name not in field_values:
+            continue
+        expected = field_values[name] & ((1 << layout.fields[index].width) - 1)
+        report(pages_ok & field_ok & (expected != decoded[name]), "field",
+               lambda i, e=expected: int(e[i]), lambda i, d=decoded[name]: int(d[i]),
+               field=layout.labels.get(name, name))
+
+    if not field_values:
+        return mismatches
+
+    # Re-encode from the field rows: catches differences in bits no field row covers
+    exp_x, exp_y, exp_crc = encode_layout_batch(plan, field_values)
+    report(pages_ok & field_ok & (pages_to_words(exp_x) != pages_to_words(x_pages)), "PAGE -X",
+           lambda i: exp_x[i].tobytes().hex(), lambda i: x_pages[i].tobytes().hex())
+    report(pages_ok & field_ok & (pages_to_words(exp_y) != pages_to_words(y_pages)), "PAGE -Y",
+           lambda i: exp_y[i].tobytes().hex(), lambda i: y_pages[i].tobytes().hex())
+
+    return mismatches
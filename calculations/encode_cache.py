@@ -0,0 +1,104 @@
+"""
+Process-wide LRU cache of encoded tags, keyed on the layout and the normalized field tuple.
+
+Excel, PDF and RFID generation for a station all re-encode the same tags; with the cache in
+front of the NT / AlineT / AdjT encoders, repeated runs only pay for tags whose fields changed.
+Size comes from TAG_ENCODE_CACHE_SIZE (0 disables caching).
+
+Only the scalar per-tag encoders (calculate_values / generate_pages_for_tag) go through it.
+TD sheets are encoded whole by calculations.batch, which bypasses the cache: a per-tag lookup
+would cost more than the vectorized encode. Repeated /api/convert-file and /api/generate-pdf
+runs skip encoding through components.parse_cache instead (whole workbooks, and unchanged tag
+columns of an edited one), whose counters /api/parse-cache-stats serves; this cache's stats()
+are not exposed by the app, as no request path reaches it.
+"""
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Sequence
+
+from calculations.bit_layout import PackingPlan
+
+DEFAULT_SIZE = 16384
+
+
+class EncodeCache:
+    def __init__(self, maxsize: int = DEFAULT_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(plan: PackingPlan, values: Sequence[int]) -> tuple:
+        """
+        Values are masked to their field width, so two tags that encode to the same bits share a key.
+        """
+        masks = _field_masks(plan)
+        return (plan.layout.name,) + tuple(int(v) & m for v, m in zip(values, masks))
+
+    def get_or_encode(self, plan: PackingPlan, values: Sequence[int], encode: Callable[[], object]):
+        """
+        Cached result for the tag with `values` (in plan.field_names order), else encode() it.
+        Results are shared between callers, so `encode` must return something immutable.
+        """
+        if self.maxsize <= 0:
+            return encode()
+
+        key = self.make_key(plan, values)
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return result
+            self.misses += 1
+
+        result = encode()
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return result
+
+    def resize(self, maxsize: int):
+        with self._lock:
+            self.maxsize = maxsize
+            while len(self._entries) > max(maxsize, 0):
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+_MASKS = {}
+
+
+def _field_masks(plan: PackingPlan) -> tuple:
+    masks = _MASKS.get(plan.layout)
+    if masks is None:
+        masks = tuple((1 << f.width) - 1 for f in plan.layout.fields)
+        _MASKS[plan.layout] = masks
+    return masks
+
+
+ENCODE_CACHE = EncodeCache(int(os.environ.get("TAG_ENCODE_CACHE_SIZE", DEFAULT_SIZE)))
@@ -0,0 +1,140 @@
+"""
+Incremental re-encoding of single-field edits using the linearity of CRC-30.
+
+CRC(m) = L(m) ^ CRC(0) for a linear map L over GF(2), so changing some payload bits by `d`
+changes the CRC by L(d) alone. For every field of a layout we precompute L for each value
+bit, folded into one 256-entry table per value byte; a corrected fAbsLoc or TIN then costs a
+few table lookups instead of re-hashing the whole 13-byte payload.
+"""
+from functools import lru_cache
+from typing import Dict, Mapping, Tuple
+
+import numpy as np
+
+from calculations import crc30
+from calculations.batch import pages_to_words, words_to_pages
+from calculations.bit_layout import TagLayout, get_plan
+from calculations.layouts import LAYOUTS
+
+_ZERO_CRC = crc30.crc30(bytes(13))
+
+
+def _payload_bit_crc(page: str, bit: int) -> int:
+    """L(e) for the single payload bit `page``bit` (X0..X63, Y0..Y39)."""
+    if page == 'X':
+        message = (1 << bit).to_bytes(8, 'little') + bytes(5)
+    else:
+        message = bytes(8) + (1 << bit).to_bytes(5, 'little')
+    return crc30.crc30(message) ^ _ZERO_CRC
+
+
+def _field_segments(plan, index):
+    """(page, value shift, mask, page shift) for every segment of field `index`."""
+    return tuple((page, vshift, mask, shift)
+                 for page, ops in (('X', plan.x_ops), ('Y', plan.y_ops))
+                 for i, vshift, mask, shift in ops if i == index)
+
+
+@lru_cache(maxsize=None)
+def crc_delta_tables(layout: TagLayout) -> Dict[str, Tuple[Tuple[int, ...], ...]]:
+    """
+    Field name -> one 256-entry table per value byte, giving the CRC change for those value bits.
+    """
+    plan = get_plan(layout)
+    tables = {}
+    for index, name in enumerate(plan.field_names):
+        width = layout.fields[index].width
+        basis = [0] * width
+        for page, vshift, mask, shift in _field_segments(plan, index):
+            for k in range(mask.bit_length()):
+                basis[vshift + k] = _payload_bit_crc(page, shift + k)
+
+        field_tables = []
+        for start in range(0, width, 8):
+            chunk = basis[start:start + 8] + [0] * 8
+            table = [0] * 256
+            for b in range(1, 256):
+                low = b & -b
+                table[b] = table[b ^ low] ^ chunk[low.bit_length() - 1]
+            field_tables.append(tuple(table))
+        tables[name] = tuple(field_tables)
+    return tables
+
+
+@lru_cache(maxsize=None)
+def _field_edits(layout: TagLayout):
+    """Field name -> (value mask, segments, CRC delta tables), everything reencode needs per field."""
+    plan = get_plan(layout)
+    tables = crc_delta_tables(layout)
+    return {name: ((1 << layout.fields[i].width) - 1, _field_segments(plan, i), tables[name])
+            for i, name in enumerate(plan.field_names)}
+
+
+def _to_words(page) -> int:
+    if isinstance(page, str):
+        page = bytes.fromhex(page.strip().ljust(16, '0'))
+    return int.from_bytes(bytes(page[:8]), 'big')
+
+
+def reencode(layout_name: str, page_x, page_y, changes: Mapping[str, int]):
+    """
+    Applies `changes` (field name -> new value) to an already encoded tag and returns
+    (page_x, page_y, crc) as bytes / bytes / int, without recomputing the CRC from scratch.
+    `page_x` / `page_y` may be bytes or hex strings.
+    """
+    layout = LAYOUTS[layout_name]
+    edits = _field_edits(layout)
+    crc_bits = layout.crc_bits
+    crc_mask = (1 << crc_bits.width) - 1
+
+    words = {'X': _to_words(page_x), 'Y': _to_words(page_y)}
+    crc = (words[crc_bits.page] >> crc_bits.lsb) & crc_mask
+
+    for name, new_value in changes.items():
+        if name not in edits:
+            raise KeyError(f"Unknown field {name} for layout {layout_name}")
+        value_mask, segments, tables = edits[name]
+        new_value = int(new_value) & value_mask
+
+        old_value = 0
+        for page, vshift, mask, shift in segments:
+            old_value |= ((words[page] >> shift) & mask) << vshift
+            words[page] = (words[page] & ~(mask << shift)) | (((new_value >> vshift) & mask) << shift)
+
+        delta = old_value ^ new_value
+        for table in tables:
+            crc ^= table[delta & 0xFF]
+            delta >>= 8
+
+    y = words['Y'] & ~(crc_mask << crc_bits.lsb) | (crc << crc_bits.lsb)
+    return words['X'].to_bytes(8, 'big'), y.to_bytes(8, 'big'), crc
+
+
+def reencode_batch(layout_name: str, page_x, page_y, field: str, new_values):
+    """
+    Vectorized reencode of one field across many tags: uint8[N, 8] pages in,
+    (page_x uint8[N, 8], page_y uint8[N, 8], crc uint32[N]) out.
+    """
+    layout = LAYOUTS[layout_name]
+    value_mask, segments, tables = _field_edits(layout)[field]
+    crc_bits = layout.crc_bits
+
+    words = {'X': pages_to_words(page_x), 'Y': pages_to_words(page_y)}
+    crc_mask = np.uint64((1 << crc_bits.width) - 1)
+    crc = (words[crc_bits.page] >> np.uint64(crc_bits.lsb)) & crc_mask
+
+    new_values = np.asarray(new_values, dtype=np.int64).reshape(-1).astype(np.uint64)
+    new_values &= np.uint64(value_mask)
+    old_values = np.zeros(len(new_values), dtype=np.uint64)
+    for page, vshift, mask, shift in segments:
+        mask, shift, vshift = np.uint64(mask), np.uint64(shift), np.uint64(vshift)
+        old_values |= ((words[page] >> shift) & mask) << vshift
+        words[page] = (words[page] & ~(mask << shift)) | (((new_values >> vshift) & mask) << shift)
+
+    delta = old_values ^ new_values
+    for j, table in enumerate(tables):
+        table = np.array(table, dtype=np.uint64)
+        crc ^= table[((delta >> np.uint64(8 * j)) & np.uint64(0xFF)).astype(np.intp)]
+
+    y = (words['Y'] & ~(crc_mask << np.uint64(crc_bits.lsb))) | (crc << np.uint64(crc_bits.lsb))
+    return words_to_pages(words['X']), words_to_pages(y), crc.astype(np.uint32)
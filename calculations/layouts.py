@@ -0,0 +1,124 @@
+"""
+Bit layouts of the Kavach RFID tag types (Spec 4.0).
+
+Field names double as the keys of the batch encoders and the columns of a TagBatch.
+To add a tag type or spec version, declare another TagLayout here and register it in LAYOUTS;
+components.sheet_types then matches TD sheets to it by their row labels.
+"""
+from calculations.bit_layout import TagLayout, bit_field, get_plan
+
+NT_LAYOUT = TagLayout(
+    name='NT',
+    version='4.0',
+    trim_zeros=True,
+    fields=(
+        bit_field('uctypeofTag', 'X3 - X0', default=9,
+                  label='Type of Tag (9- Normal, 10 - LC, 11- Adj.Line ,12-Junction)'),
+        bit_field('uc_version', 'X5 - X4', default=1,
+                  label='Version(As per Spec 4.0)'),
+        bit_field('uiUniqueID', 'X15 - X6',
+                  label='Unique ID of RFID Tag Set'),
+        bit_field('fAbsLoc', 'X38 - X16',
+                  label='Absolute Loc In  meters'),
+        bit_field('ucTagPlacement', 'Y29 - Y27',             # encoder has always written 3 bits
+                  label='Tag Placement(0-InL, 1- SIG(N), 2-SIG(R), 3-Tout, 4-Exit(N),5-Exit(R), 6-SIG(N/R),7-exit tag both directions, 8-Dead stopin Nominal,9- Dead stop in Reverse)'),
+        bit_field('AbsoluteLocationReset', 'Y31 - Y30',
+                  label='Tag Duplication (0-Main tag,1-Dup tag)'),
+        bit_field('nominal_ucTin', 'X46 - X39',
+                  label='TIN in Nominal Direction'),
+        bit_field('nominal_StationId', 'Y6 - Y0 & X63 - X55',
+                  label='Station ID in Nominal Direction'),
+        bit_field('nominal_comMark', 'Y32',
+                  label='Communication in Nominal Direction  (0- Required, 1- Not Required).'),
+        bit_field('nominal_secType', 'Y24 - Y23',
+                  label='Section type in Nominal Direction ( 0-Station, 1- Abs Blk, 2-Auto, 3- VBlk)'),
+        bit_field('reverse_ucTin', 'X54 - X47',
+                  label='TIN in Reverse Direction'),
+        bit_field('reverse_StationId', 'Y22 - Y7',
+                  label='Station ID in Reverse Direction'),
+        bit_field('reverse_comMark', 'Y33',
+                  label='Communication in Reverse Direction. (0- Required, 1- Not Required).'),
+        bit_field('reverse_secType', 'Y26 - Y25',
+                  label='Section type in Reverse Direction ( 0-Station, 1- Abs Blk, 2-Auto, 3- VBlk)'),
+    ),
+)
+
+ALINE_LAYOUT = TagLayout(
+    name='AlineT',
+    version='4.0',
+    fields=(
+        bit_field('uctypeofTag', 'X3 - X0', default=11,
+                  label='Type of Tag (9- Normal, 10 - LC, 11- Adj.Line ,12-Junction)'),
+        bit_field('uc_version', 'X5 - X4', default=1,
+                  label='Version(As per Spec 4.0)'),
+        bit_field('uiUniqueID', 'X15 - X6',
+                  label='Unique ID of RFID Tag Set'),
+        bit_field('fAbsLoc', 'X38 - X16',
+                  label='Absolute Loc In  meters'),
+        bit_field('nominal_ucTin', 'X46 - X39',
+                  label='TIN in Nominal Direction'),
+        bit_field('reverse_ucTin', 'X54 - X47',
+                  label='TIN in Reverse Direction'),
+        bit_field('AdjLine1_tin', 'X62 - X55',
+                  label='Adjacent Line-1 TIN'),
+        bit_field('AdjLine2_tin', 'Y6 - Y0 & X63',
+                  label='Adjacent Line-2 TIN'),
+        bit_field('AdjLine3_tin', 'Y14 - Y7',
+                  label='Adjacent Line-3 TIN'),
+        bit_field('AdjLine4_tin', 'Y22 - Y15',
+                  label='Adjacent Line-4 TIN'),
+        bit_field('AdjLine5_tin', 'Y30 - Y23',
+                  label='Adjacent Line-5 TIN'),
+        bit_field('ucTagDuplication', 'Y31',
+                  label='Tag Duplication (0-Main tag,1-Dup tag)'),
+    ),
+)
+
+ADJ_LAYOUT = TagLayout(
+    name='AdjT',
+    version='4.0',
+    trim_zeros=True,
+    fields=(
+        bit_field('uctypeofTag', 'X3 - X0', default=12,
+                  label='Type of Tag (9- Normal, 10 - LC, 11- Adj.Line ,12-Junction)'),
+        bit_field('uc_version', 'X5 - X4', default=1,
+                  label='Version(As per Spec 4.0)'),
+        bit_field('uiUniqueID', 'X15 - X6',
+                  label='Unique ID of RFID Tag Set'),
+        bit_field('fAbsLoc1', 'X38 - X16',
+                  label='Absolute Loc In  meters-1'),
+        bit_field('fAbsLoc2', 'Y13 - Y0 & X63 - X55',
+                  label='Absolute Loc In  meters-2'),
+        bit_field('nominal_ucTin', 'X46 - X39',
+                  label='TIN 1'),
+        bit_field('reverse_ucTin', 'X54 - X47',
+                  label='TIN 2'),
+        bit_field('dirResetAbsLoc1', 'Y16 - Y14',
+                  label='Direction reset absolute location-1'),
+        bit_field('dirResetAbsLoc2', 'Y19 - Y17',
+                  label='Direction reset absolute location-2'),
+        bit_field('locCorrectionType', 'Y20',
+                  label='Location Correction Type'),
+        bit_field('secTypeNominal', 'Y24 - Y23',
+                  label='Section type in nominal direction'),
+        bit_field('secTypeReverse', 'Y26 - Y25',
+                  label='Section type in reverse direction'),
+        bit_field('tagType', 'Y31',
+                  label='Tag type'),
+        bit_field('comMarkNominal', 'Y32',
+                  label='Communication in nominal direction'),
+        bit_field('comMarkReverse', 'Y33',
+                  label='Communication in reverse direction'),
+        # Reserved (Y22 - Y21) and Reserved_1 (Y30 - Y27) are always left zero
+    ),
+)
+
+LAYOUTS = {
+    'NT': NT_LAYOUT,
+    'AlineT': ALINE_LAYOUT,
+    'AdjT': ADJ_LAYOUT,
+}
+
+NT_PLAN = get_plan(NT_LAYOUT)
+ALINE_PLAN = get_plan(ALINE_LAYOUT)
+ADJ_PLAN = get_plan(ADJ_LAYOUT)
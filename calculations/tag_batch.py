@@ -0,0 +1,148 @@
+"""
+Struct-of-arrays container for a sheet's tags: one typed NumPy column per layout field.
+
+A 50k-tag division costs a couple of bytes per field per tag instead of a TagInfo and two
+TagDir objects per tag. TagView gives single-tag access without materializing a dataclass;
+the scalar encoders accept it wherever they take a TagInfo.
+"""
+from typing import Dict, Iterable, Mapping, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from calculations.batch import encode_layout_batch, format_crcs, format_pages
+from calculations.bit_layout import TagLayout, get_plan
+from calculations.layouts import LAYOUTS
+
+
+def column_dtype(width: int):
+    """Smallest unsigned dtype holding a `width`-bit field."""
+    if width <= 8:
+        return np.uint8
+    if width <= 16:
+        return np.uint16
+    return np.uint32
+
+
+class TagView:
+    """Read-only view of one tag of a TagBatch; fields are attributes (`view.fAbsLoc`)."""
+    __slots__ = ('batch', 'index')
+
+    def __init__(self, batch: 'TagBatch', index: int):
+        self.batch = batch
+        self.index = index
+
+    def __getattr__(self, name):
+        try:
+            column = self.batch.columns[name]
+        except KeyError:
+            raise AttributeError(name) from None
+        return int(column[self.index])
+
+    @property
+    def name(self) -> Optional[str]:
+        names = self.batch.tag_names
+        return names[self.index] if names is not None else None
+
+    @property
+    def values(self) -> tuple:
+        """Field values in layout order, as taken by PackingPlan.pack."""
+        return tuple(int(self.batch.columns[name][self.index]) for name in self.batch.layout.field_names)
+
+    def to_dict(self) -> Dict[str, int]:
+        return dict(zip(self.batch.layout.field_names, self.values))
+
+    def __repr__(self):
+        return f"TagView({self.batch.layout.name}, {self.name or self.index}, {self.to_dict()})"
+
+
+class TagBatch:
+    """
+    All tags of one layout. `columns` maps every field name to an unsigned array of length N;
+    values are masked to their field width, exactly as the encoders would write them.
+    """
+    __slots__ = ('layout', 'columns', 'tag_names')
+
+    def __init__(self, layout: TagLayout, columns: Mapping[str, Sequence[int]],
+                 tag_names: Optional[Sequence[str]] = None):
+        lengths = {len(np.asarray(v).reshape(-1)) for v in columns.values()}
+        if tag_names is not None:
+            lengths.add(len(tag_names))
+        if len(lengths) > 1:
+            raise ValueError(f"Columns have different lengths: {sorted(lengths)}")
+        n = lengths.pop() if lengths else 0
+
+        self.layout = layout
+        self.tag_names = list(tag_names) if tag_names is not None else None
+        self.columns = {}
+        for spec in layout.fields:
+            if spec.name in columns:
+                values = np.asarray(columns[spec.name], dtype=np.int64).reshape(-1)
+            else:
+                values = np.full(n, spec.default, dtype=np.int64)
+            self.columns[spec.name] = (values & ((1 << spec.width) - 1)).astype(column_dtype(spec.width))
+
+    @classmethod
+    def from_columns(cls, layout_name: str, columns: Mapping[str, Sequence[int]],
+                     tag_names: Optional[Sequence[str]] = None) -> 'TagBatch':
+        return cls(LAYOUTS[layout_name], columns, tag_names)
+
+    @classmethod
+    def from_tags(cls, layout_name: str, tags: Iterable, tag_names: Optional[Sequence[str]] = None) -> 'TagBatch':
+        """
+        Builds a batch from TagInfo objects (or TagViews) of the layout's calculations module.
+        """
+        from calculations.decoder import TAGINFO_FIELDS
+        layout = LAYOUTS[layout_name]
+        flatten = TAGINFO_FIELDS[layout_name]
+        rows = [flatten(tag) for tag in tags]
+        columns = {name: [row[i] for row in rows] for i, name in enumerate(layout.field_names)}
+        return cls(layout, columns, tag_names)
+
+    def __len__(self):
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+
+    def __getitem__(self, index: int) -> TagView:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return TagView(self, index)
+
+    def __iter__(self):
+        return (TagView(self, i) for i in range(len(self)))
+
+    @property
+    def nbytes(self) -> int:
+        return sum(column.nbytes for column in self.columns.values())
+
+    def to_taginfos(self) -> list:
+        from calculations.decoder import TAGINFO_BUILDERS
+        build = TAGINFO_BUILDERS[self.layout.name]
+        columns = [self.columns[name].tolist() for name in self.layout.field_names]
+        return [build(values) for values in zip(*columns)]
+
+    def encode(self):
+        """(page_x uint8[N, 8], page_y uint8[N, 8], crc uint32[N]) for every tag."""
+        return encode_layout_batch(get_plan(self.layout), self.columns)
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        The batch as a formatted TD sheet frame (same columns as process_input_sheet output),
+        ready for format_sheet / format_pdf_table.
+        """
+        page_x, page_y, crc = self.encode()
+        tag_names = self.tag_names or [str(i + 1) for i in range(len(self))]
+        crc_bits = self.layout.crc_bits
+        frame = pd.DataFrame({
+            "FIELD NAME / DESCRIPTION": [f.label or f.name for f in self.layout.fields] + ["CRC", "PAGE -X", "PAGE -Y"],
+            "BIT POSITION": [f.bit_position for f in self.layout.fields] + [str(crc_bits), "", ""],
+            "Size (Bits)": [f.width for f in self.layout.fields] + [crc_bits.width, 64, 64],
+        })
+        tag_rows = np.array([self.columns[name].tolist() for name in self.layout.field_names], dtype=object)
+        tag_rows = tag_rows.reshape(len(self.layout.fields), len(self))
+        results = np.array([format_crcs(crc),
+                            format_pages(page_x, self.layout.trim_zeros),
+                            format_pages(page_y, self.layout.trim_zeros)], dtype=object).reshape(3, len(self))
+        tags = pd.DataFrame(np.vstack([tag_rows, results]), columns=tag_names)
+        return pd.concat([frame, tags], axis=1)
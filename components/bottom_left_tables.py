@@ -1,6 +1,8 @@
 from reportlab.lib import colors
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.platypus import Table, TableStyle, Paragraph, Image
+import itertools
+import numpy as np
 import pandas as pd
 import re
 from collections import Counter, defaultdict
@@ -10,6 +12,7 @@ from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.lib.enums import TA_LEFT, TA_CENTER
 from reportlab.lib.units import mm
 from datetime import datetime
+from components.workbook_ingest import get_reader_backend, rows_to_frame, stream_workbook
 
 
 current_date = datetime.now().strftime("%d.%m.%Y")
@@ -556,111 +559,202 @@ def draw_combined_station_and_border_table(
     
 
 
-def extract_tag_and_tin_ranges(file_path):
-    # Regex to match tag numbers like 947/M, 947/D
-    tag_pattern = re.compile(r"(\d{3,4})[\/_]([MD])", re.IGNORECASE)
-    tin_keywords = ["TIN 1", "TIN 2", "TIN in Nominal Direction", "TIN in Reverse Direction"]
-    station_keywords = ["Station ID in Nominal Direction", "Station ID in Reverse Direction"]
+TAG_PATTERN = re.compile(r"(\d{3,4})[\/_]([MD])", re.IGNORECASE)
+TIN_KEYWORDS = ["TIN 1", "TIN 2", "TIN in Nominal Direction", "TIN in Reverse Direction"]
+STATION_KEYWORDS = ["Station ID in Nominal Direction", "Station ID in Reverse Direction"]
+TIN_ROW_KEYS = [keyword.upper() for keyword in TIN_KEYWORDS]
+STATION_ROW_KEYS = {"nominal": STATION_KEYWORDS[0].upper(), "reverse": STATION_KEYWORDS[1].upper()}
+
+
+class _RangeScan:
+    """Tags, TINs and station IDs collected across the sheets of a TD workbook."""
+
+    def __init__(self):
+        self.tag_numbers = set()
+        self.tin_numbers = set()
+        self.station_id_list = []
+        self.tag_station_map = defaultdict(dict)  # Format: {947: {"nominal": "37111", "reverse": "37112"}}
+
+    def header_tags(self, values, tag_columns):
+        """Adds the tags found in one header candidate row; returns how many were found."""
+        tag_count = 0
+        for col_idx, val in enumerate(values):
+            match = TAG_PATTERN.search(str(val).strip())
+            if match:
+                tag_num = int(match.group(1))
+                tag_columns[col_idx] = tag_num
+                self.tag_numbers.add(tag_num)
+                tag_count += 1
+        return tag_count
+
+    def map_station_ids(self, nominal_row, reverse_row, tag_columns):
+        if nominal_row is None or reverse_row is None:
+            print("Nominal or Reverse station ID row not found in NT sheet")
+            return
+        for col_idx, tag_num in tag_columns.items():
+            try:
+                nominal_id = str(int(float(nominal_row[col_idx])))
+                reverse_id = str(int(float(reverse_row[col_idx])))
+                self.tag_station_map[tag_num]['nominal'] = nominal_id
+                self.tag_station_map[tag_num]['reverse'] = reverse_id
+                self.station_id_list.extend([nominal_id, reverse_id])
+            except (ValueError, TypeError) as e:
+                print(f"Error processing tag {tag_num} at column {col_idx}: {e}")
+                continue
 
-    tag_numbers = set()
-    tin_numbers = set()
-    station_id_list = []
-    tag_station_map = defaultdict(dict)  # Format: {947: {"nominal": "37111", "reverse": "37112"}}
+    def tins(self, values):
+        for val in values:
+            try:
+                num = int(float(val))
+                if num >= 100:
+                    self.tin_numbers.add(num)
+            except (ValueError, TypeError):
+                continue
 
-    try:
+    @staticmethod
+    def station_ids(values):
+        ids = []
+        for val in values:
+            val_str = str(val).strip()
+            if val_str.isdigit() and len(val_str) >= 4:
+                ids.append(val_str)
+        return ids
+
+    def scan_rows(self, sheet, rows, tag_columns):
+        """
+        One pass over a sheet's rows (cells as read, "" or NaN when empty). Each row is joined and
+        upper-cased once; a row can only name a TIN or a station ID if one of its cells holds "TIN"
+        or "STATION", so only those rows are normalized cell by cell (as df.iloc[i].astype(str)
+        shows them) and indexed by what they name. Tags, TINs and station IDs are then pulled from
+        the index.
+        """
+        index = defaultdict(list)
+        last = -1
+        for i, row in enumerate(rows):
+            last = i
+            text = " ".join(map(str, row)).upper()
+            if "TIN" not in text and "STATION" not in text:
+                continue
+            values = [_cell_str(v) for v in row]
+            row_str = " ".join(val.strip().upper() for val in values)
+            if any(keyword in row_str for keyword in TIN_ROW_KEYS):
+                index["tin"].append(values)
+            if "STATION ID" in row_str:
+                index["station"].append(values)
+            for kind, keyword in STATION_ROW_KEYS.items():
+                if keyword in row_str:
+                    index[kind].append((i, row))
+
+        # Process "NT" sheet for station IDs; station rows only count if another row follows them
+        if sheet.upper() == "NT":
+            nominal_row, reverse_row = (
+                next(([np.nan if v == "" else v for v in row] for i, row in reversed(index[kind]) if i < last), None)
+                for kind in ("nominal", "reverse")
+            )
+            self.map_station_ids(_pad_row(nominal_row, tag_columns), _pad_row(reverse_row, tag_columns), tag_columns)
+
+        for values in index["tin"]:
+            self.tins(values)
+        for values in index["station"]:
+            self.station_id_list.extend(self.station_ids(values))
+
+    def scan_workbook_pandas(self, file_path):
         xls = pd.ExcelFile(file_path)
+        sheets = (
+            (sheet, iter(pd.read_excel(xls, sheet_name=sheet, header=None).to_numpy(dtype=object).tolist()))
+            for sheet in xls.sheet_names
+        )
+        self.scan_sheets(sheets, lambda sheet, rows: pd.read_excel(xls, sheet_name=sheet, header=1))
+
+    def fallback_header_tags(self, sheet, df, tag_columns):
+        for col in df.columns:
+            match = TAG_PATTERN.search(str(col).strip())
+            if match:
+                tag_num = int(match.group(1))
+                self.tag_numbers.add(tag_num)
+                tag_columns[df.columns.get_loc(col)] = tag_num
+        if not tag_columns:
+            print(f"No tags found in columns for sheet {sheet}")
+            return False
+        return True
+
+    def scan_workbook_stream(self, file_path):
+        self.scan_sheets(stream_workbook(file_path))
+
+    def scan_sheets(self, sheets, header_frame=None):
+        """
+        scan_rows over (sheet name, row iterator) pairs as stream_workbook yields them: only the first
+        five rows (while looking for the tag header) and the indexed TIN / station rows are held in
+        memory. Sheets without a tag header row fall back to the rows of the header=1 frame, from
+        `header_frame(sheet, rows)` or built from the rows already read.
+        """
+        for sheet, rows in sheets:
+            head = []
+            header_row = None
+            tag_columns = {}
+
+            for i, row in enumerate(rows):
+                head.append(row)
+                if self.header_tags([_cell_str(v) for v in row], tag_columns) > 5:
+                    header_row = i
+                    break
+                if i == 4:
+                    break
+
+            if header_row is None:
+                all_rows = head + list(rows)
+                if header_frame is not None:
+                    df = header_frame(sheet, all_rows)
+                else:
+                    width = max((len(r) for r in all_rows), default=0)
+                    df = rows_to_frame([r + [""] * (width - len(r)) for r in all_rows], header=1)
+                if self.fallback_header_tags(sheet, df, tag_columns):
+                    self.scan_rows(sheet, df.to_numpy(dtype=object).tolist(), tag_columns)
+                continue
+
+            self.scan_rows(sheet, itertools.chain(head, rows), tag_columns)
+
+
+def _cell_str(value):
+    # Cell as df.iloc[i].astype(str) shows it for a header=None frame
+    return "nan" if value == "" else str(value)
+
+
+def _pad_row(values, tag_columns):
+    if values is None:
+        return None
+    width = max(tag_columns, default=-1) + 1
+    return values + [np.nan] * (width - len(values))
+
+
+def extract_tag_and_tin_ranges(file_path, backend=None):
+    """
+    (alloted_tags, alloted_tins, station_ids, most_station_id, border_tags) of a TD workbook.
+    `backend` ("stream" / "pandas") defaults to TD_READER_BACKEND.
+    """
+    scan = _RangeScan()
+    try:
+        if get_reader_backend(backend) == "stream":
+            scan.scan_workbook_stream(file_path)
+        else:
+            scan.scan_workbook_pandas(file_path)
     except FileNotFoundError:
         print(f"Error: File '{file_path}' not found.")
         return "", "", "", "", ""
+    return _summarise_scan(scan)
 
-    for sheet in xls.sheet_names:
-        # Read the sheet, try different header rows to find the correct one
-        df = pd.read_excel(xls, sheet_name=sheet, header=None)
-        header_row = None
-        tag_columns = {}
-
-        # Find the row with tag headers (e.g., 947/M, 947/D)
-        for i in range(min(5, len(df))):  # Check first 5 rows
-            row = df.iloc[i].astype(str)
-            tag_count = 0
-            for col_idx, val in enumerate(row):
-                match = tag_pattern.search(val.strip())
-                if match:
-                    tag_num = int(match.group(1))
-                    tag_columns[col_idx] = tag_num
-                    tag_numbers.add(tag_num)
-                    tag_count += 1
-            if tag_count > 5:  # Assume row is header if multiple tags found
-                header_row = i
-                break
-
-        if header_row is None:
-            df = pd.read_excel(xls, sheet_name=sheet, header=1)
-            for col in df.columns:
-                match = tag_pattern.search(str(col).strip())
-                if match:
-                    tag_num = int(match.group(1))
-                    tag_numbers.add(tag_num)
-                    tag_columns[df.columns.get_loc(col)] = tag_num
-            if not tag_columns:
-                print(f"No tags found in columns for sheet {sheet}")
-                continue
 
-        # Process "NT" sheet for station IDs
-        if sheet.upper() == "NT":
-            nominal_row = None
-            reverse_row = None
-            # Find station ID rows
-            for i in range(len(df)):
-                row = df.iloc[i].astype(str)
-                row_str = " ".join(val.strip().upper() for val in row if pd.notna(val))
-                if "STATION ID IN NOMINAL DIRECTION" in row_str:
-                    if i + 1 < len(df):
-                        nominal_row = df.iloc[i]
-                        # print(f"Nominal station ID row at index {i}: {nominal_row.values}")
-                if "STATION ID IN REVERSE DIRECTION" in row_str:
-                    if i + 1 < len(df):
-                        reverse_row = df.iloc[i]
-                        # print(f"Reverse station ID row at index {i}: {reverse_row.values}")
-
-            # Map tags to station IDs
-            if nominal_row is not None and reverse_row is not None:
-                for col_idx, tag_num in tag_columns.items():
-                    try:
-                        nominal_id = str(int(float(nominal_row.iloc[col_idx])))
-                        reverse_id = str(int(float(reverse_row.iloc[col_idx])))
-                        tag_station_map[tag_num]['nominal'] = nominal_id
-                        tag_station_map[tag_num]['reverse'] = reverse_id
-                        station_id_list.extend([nominal_id, reverse_id])
-                    except (ValueError, TypeError) as e:
-                        print(f"Error processing tag {tag_num} at column {col_idx}: {e}")
-                        continue
-            else:
-                print("Nominal or Reverse station ID row not found in NT sheet")
-
-        # Extract TIN numbers
-        for i in range(len(df)):
-            row = df.iloc[i].astype(str)
-            row_str = " ".join(val.strip().upper() for val in row if pd.notna(val))
-            if any(keyword.upper() in row_str for keyword in tin_keywords):
-                for val in row:
-                    try:
-                        num = int(float(val))
-                        if num >= 100:
-                            tin_numbers.add(num)
-                    except (ValueError, TypeError):
-                        continue
-
-        # Generic Station ID capture
-        for i in range(len(df)):
-            row = df.iloc[i].astype(str)
-            row_str = " ".join(val.strip().upper() for val in row if pd.notna(val))
-            if "STATION ID" in row_str:
-                for val in row:
-                    val_str = str(val).strip()
-                    if val_str.isdigit() and len(val_str) >= 4:
-                        station_id_list.append(val_str)
+def tag_and_tin_ranges_from_rows(sheets):
+    """
+    extract_tag_and_tin_ranges over rows that were already read, as (sheet name, rows) pairs
+    from stream_workbook.
+    """
+    scan = _RangeScan()
+    scan.scan_sheets((sheet, iter(rows)) for sheet, rows in sheets)
+    return _summarise_scan(scan)
+
 
+def _summarise_scan(scan):
     def group_into_ranges(numbers):
         sorted_nums = sorted(numbers)
         if not sorted_nums:
@@ -676,15 +770,16 @@ def extract_tag_and_tin_ranges(file_path):
         ranges.append((start, end))
         return ", ".join(f"{s}-{e}" if s != e else f"{s}" for s, e in ranges)
 
-    alloted_tags = group_into_ranges(tag_numbers)
-    alloted_tins = group_into_ranges(tin_numbers)
+    station_id_list = scan.station_id_list
+    alloted_tags = group_into_ranges(scan.tag_numbers)
+    alloted_tins = group_into_ranges(scan.tin_numbers)
     unique_station_ids = sorted(set(station_id_list))
     station_ids = ", ".join(unique_station_ids)
     most_station_id = Counter(station_id_list).most_common(1)[0][0] if station_id_list else ""
 
     # Tags with different Nominal and Reverse station IDs
     diff_station_tags = []
-    for tag_num, dirs in tag_station_map.items():
+    for tag_num, dirs in scan.tag_station_map.items():
         if 'nominal' in dirs and 'reverse' in dirs and dirs['nominal'] != dirs['reverse']:
             diff_station_tags.append(tag_num)
     border_tags = diff_station_tags
@@ -0,0 +1,81 @@
+"""
+Named cell styles for the formatted TD workbook.
+
+Assigning font, border, fill and alignment objects cell by cell makes openpyxl hash and look up
+every one of them in the workbook's style lists. A StyleRegistry adds each distinct combination
+to the workbook once as a NamedStyle; cells then get it with a single `cell.style = name`.
+Attributes a style does not set keep the workbook defaults, as on an unstyled cell.
+"""
+import weakref
+
+from openpyxl.styles import Alignment, Font, NamedStyle
+from openpyxl.styles.borders import DEFAULT_BORDER
+from openpyxl.styles.fills import DEFAULT_EMPTY_FILL
+from openpyxl.styles.fonts import DEFAULT_FONT
+
+DEFAULT_ALIGNMENT = Alignment()
+FOOTER_ALIGNMENT = Alignment(horizontal='center', vertical='center', wrap_text=True)
+
+_registries = weakref.WeakKeyDictionary()      # workbook -> its StyleRegistry
+
+
+def footer_font(font, size):
+    """A footer template cell's font at `size`."""
+    return Font(
+        name=font.name,
+        bold=font.bold,
+        italic=font.italic,
+        vertAlign=font.vertAlign,
+        underline=font.underline,
+        strike=font.strike,
+        color=font.color,
+        size=size
+    )
+
+
+class StyleRegistry:
+    """The NamedStyles of one workbook, added on first use. Get it with StyleRegistry.of(wb)."""
+
+    def __init__(self, wb):
+        self.wb = wb
+        self._names = {}        # (font, fill, border, alignment) -> style name
+        self._footer = {}       # (id(template cell), font size) -> (template cell, style name)
+
+    @classmethod
+    def of(cls, wb) -> "StyleRegistry":
+        """The workbook's registry, so every sheet formatted into it shares the same styles."""
+        registry = _registries.get(wb)
+        if registry is None:
+            registry = _registries[wb] = cls(wb)
+        return registry
+
+    def style(self, name, font=DEFAULT_FONT, fill=DEFAULT_EMPTY_FILL, border=DEFAULT_BORDER,
+              alignment=DEFAULT_ALIGNMENT) -> str:
+        """
+        Name of the style with these attributes: `name`, or `name` with a number when the
+        workbook already has a style of that name.
+        """
+        key = (font, fill, border, alignment)
+        found = self._names.get(key)
+        if found is not None:
+            return found
+
+        existing = set(self.wb.named_styles)
+        candidate, n = name, 1
+        while candidate in existing:
+            n += 1
+            candidate = f"{name} {n}"
+        self.wb.add_named_style(NamedStyle(candidate, font=font, fill=fill, border=border, alignment=alignment))
+        self._names[key] = candidate
+        return candidate
+
+    def footer_style(self, cell_data, size) -> str:
+        """Style of a footer template cell (extract_template_with_placeholders) at font `size`."""
+        key = (id(cell_data), size)
+        found = self._footer.get(key)
+        if found is not None and found[0] is cell_data:
+            return found[1]
+        name = self.style(f"TD footer {size}pt", footer_font(cell_data["font"], size), cell_data["fill"],
+                          cell_data["border"], FOOTER_ALIGNMENT)
+        self._footer[key] = (cell_data, name)
+        return name
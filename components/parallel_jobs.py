@@ -0,0 +1,248 @@
+"""
+Optional process-pool execution for TD sheet processing and multi-workbook jobs.
+
+Worker count comes from the `workers` request field or TAG_DATA_WORKERS (0 / 1 = run serially
+in the request thread, as before). Nothing crosses the process boundary as a pickled DataFrame
+or TagSheetModel: sheet frames go to the workers as per-dtype arrays (FramePayload), models
+travel as their per-tag arrays without the cached frame (ModelPayload), and formatted frames
+come back as (columns, values array) payloads.
+"""
+import atexit
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from components.tag_sheet_model import TagSheetModel
+from components.workbook_ingest import TDSheet, iter_td_sheets, read_td_workbook, workbook_sheet_names
+
+DEFAULT_WORKERS = int(os.environ.get("TAG_DATA_WORKERS", 0))
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_worker_count(value=None) -> int:
+    """`value` from the request (None / '' falls back to TAG_DATA_WORKERS), capped at the CPU count."""
+    try:
+        workers = int(value) if value not in (None, "") else DEFAULT_WORKERS
+    except (TypeError, ValueError):
+        workers = DEFAULT_WORKERS
+    return max(0, min(workers, os.cpu_count() or 1))
+
+
+def get_executor(workers: int) -> ProcessPoolExecutor:
+    """Shared pool per worker count, so requests do not pay process start-up each time."""
+    with _pools_lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            pool = ProcessPoolExecutor(max_workers=workers)
+            _pools[workers] = pool
+        return pool
+
+
+@atexit.register
+def shutdown_executors():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.shutdown(wait=False, cancel_futures=True)
+        _pools.clear()
+
+
+@dataclass
+class SheetPayload:
+    sheet_name: str
+    tag_title: str
+    columns: Optional[List[str]] = None      # None when the sheet produced no tag data
+    values: Optional[np.ndarray] = None
+
+    @classmethod
+    def from_frame(cls, sheet_name, tag_title, frame):
+        if frame is None:
+            return cls(sheet_name, tag_title)
+        return cls(sheet_name, tag_title, [str(c) for c in frame.columns], frame.to_numpy(dtype=object))
+
+    def to_frame(self):
+        if self.columns is None:
+            return None
+        return pd.DataFrame(self.values, columns=self.columns)
+
+
+@dataclass
+class FramePayload:
+    """
+    An input sheet frame as its labels plus one 2-D array per dtype. Every column keeps its dtype
+    (build_tag_sheet_model groups and fingerprints tag columns by it); extension dtypes such as
+    pandas' str travel as object arrays and are rebuilt with pd.array.
+    """
+    columns: pd.Index
+    index: pd.Index
+    blocks: list                 # (dtype, column positions, values[rows, len(positions)])
+
+    @classmethod
+    def from_frame(cls, frame):
+        positions = {}
+        for pos, dtype in enumerate(frame.dtypes):
+            positions.setdefault(dtype, []).append(pos)
+        blocks = [(dtype, pos, frame.iloc[:, pos].to_numpy(dtype=dtype if isinstance(dtype, np.dtype) else object))
+                  for dtype, pos in positions.items()]
+        return cls(frame.columns, frame.index, blocks)
+
+    def to_frame(self):
+        data = {}
+        for dtype, positions, values in self.blocks:
+            for j, pos in enumerate(positions):
+                data[pos] = values[:, j] if isinstance(dtype, np.dtype) else pd.array(values[:, j], dtype=dtype)
+        frame = pd.DataFrame({pos: data[pos] for pos in range(len(self.columns))}, index=self.index)
+        frame.columns = self.columns
+        return frame
+
+
+def _encode_strings(values):
+    return np.array([v.encode("utf-8") for v in values], dtype=bytes)
+
+
+def _decode_strings(values):
+    return [v.decode("utf-8") for v in values.tolist()]
+
+
+@dataclass
+class ModelPayload:
+    """
+    A TagSheetModel as arrays, without its cached frame (to_frame() rebuilds it). Tags whose
+    values are numpy scalars of one dtype (what build_tag_sheet_model reads) share a 2-D array of
+    that dtype; the other tags go in an object array.
+    """
+    sheet_name: str
+    field_desc: list
+    bit_positions: list
+    sizes: list
+    tag_names: np.ndarray        # utf-8 bytes, like pages_x / pages_y / fingerprints
+    value_blocks: list           # (dtype or None for object, tag positions, values[tags, field rows])
+    crcs: np.ndarray             # object: hex string, or 0 for a tag that could not be encoded
+    pages_x: np.ndarray
+    pages_y: np.ndarray
+    fingerprints: np.ndarray
+    reused_columns: int = 0
+
+    @classmethod
+    def from_model(cls, model):
+        groups = {}
+        for t, values in enumerate(model.field_values):
+            dtypes = {v.dtype if isinstance(v, np.generic) else None for v in values}
+            groups.setdefault(dtypes.pop() if len(dtypes) == 1 else None, []).append(t)
+        value_blocks = []
+        for dtype, tags in groups.items():
+            values = np.empty((len(tags), len(model.field_desc)), dtype=object if dtype is None else dtype)
+            values[:] = [model.field_values[t] for t in tags]
+            value_blocks.append((dtype, tags, values))
+        return cls(model.sheet_name, list(model.field_desc), list(model.bit_positions), list(model.sizes),
+                   _encode_strings(model.tag_names), value_blocks, np.array(model.crcs, dtype=object),
+                   _encode_strings(model.pages_x), _encode_strings(model.pages_y),
+                   _encode_strings(model.fingerprints), model.reused_columns)
+
+    def to_model(self):
+        tag_names = _decode_strings(self.tag_names)
+        field_values = [None] * len(tag_names)
+        for dtype, tags, values in self.value_blocks:
+            # list() of a typed row keeps its numpy scalars, as build_tag_sheet_model does
+            for t, row in zip(tags, values.tolist() if dtype is None else map(list, values)):
+                field_values[t] = row
+        return TagSheetModel(self.sheet_name, self.field_desc, self.bit_positions, self.sizes, tag_names,
+                             field_values, self.crcs.tolist(), _decode_strings(self.pages_x),
+                             _decode_strings(self.pages_y), _decode_strings(self.fingerprints),
+                             reused_columns=self.reused_columns)
+
+
+def _to_payload(sheet_name, tag_title, result):
+    if isinstance(result, pd.DataFrame):
+        return SheetPayload.from_frame(sheet_name, tag_title, result)
+    if isinstance(result, TagSheetModel):
+        result = ModelPayload.from_model(result)
+    return sheet_name, tag_title, result
+
+
+def _from_payload(payload):
+    if isinstance(payload, SheetPayload):
+        return payload.sheet_name, payload.tag_title, payload.to_frame()
+    sheet_name, tag_title, result = payload
+    if isinstance(result, ModelPayload):
+        result = result.to_model()
+    return sheet_name, tag_title, result
+
+
+def _process_sheet_job(process_sheet: Callable, input_path: str, sheet_name: str):
+    sheet = read_td_workbook(input_path, [sheet_name])[sheet_name]
+    return _to_payload(sheet_name, sheet.title, process_sheet(sheet_name, sheet.df))
+
+
+def _process_frame_job(process_sheet: Callable, sheet_name: str, tag_title: str, frame: FramePayload, *args):
+    args = [a.to_model() if isinstance(a, ModelPayload) else a for a in args]
+    return _to_payload(sheet_name, tag_title, process_sheet(sheet_name, frame.to_frame(), *args))
+
+
+def process_td_sheets(sheets: Sequence[TDSheet], process_sheet: Callable, workers: int = 0, previous: dict = None):
+    """
+    process_workbook_sheets for sheets that were already read (see components.parse_cache):
+    workers get the sheet frame as a FramePayload instead of re-reading the workbook. With
+    `previous` (sheet name -> last run's result), each sheet's entry is passed to process_sheet
+    as a third argument.
+    """
+    extra = lambda sheet: () if previous is None else (previous.get(sheet.name),)
+    if workers <= 1:
+        for sheet in sheets:
+            yield sheet.name, sheet.title, process_sheet(sheet.name, sheet.df, *extra(sheet))
+        return
+
+    pool = get_executor(workers)
+    futures = [pool.submit(_process_frame_job, process_sheet, s.name, s.title, FramePayload.from_frame(s.df),
+                           *(ModelPayload.from_model(a) if isinstance(a, TagSheetModel) else a for a in extra(s)))
+               for s in sheets]
+    for future in futures:
+        yield _from_payload(future.result())
+
+
+def process_workbook_sheets(input_path: str, process_sheet: Callable, workers: int = 0):
+    """
+    Runs `process_sheet(sheet_name, df)` (a module-level function such as build_tag_sheet_model)
+    on every sheet. Yields (sheet_name, tag_title, result) in workbook order.
+    """
+    if workers <= 1:
+        for sheet in iter_td_sheets(input_path):
+            yield sheet.name, sheet.title, process_sheet(sheet.name, sheet.df)
+        return
+
+    sheet_names = workbook_sheet_names(input_path)
+    pool = get_executor(workers)
+    futures = [pool.submit(_process_sheet_job, process_sheet, input_path, name) for name in sheet_names]
+    for future in futures:
+        yield _from_payload(future.result())
+
+
+def run_jobs(job: Callable, jobs: Sequence[tuple], workers: int = 0) -> List[dict]:
+    """
+    Runs `job(*args)` for every args tuple (e.g. one per station workbook), in a process pool when
+    workers > 1. Returns one {"args", "result"} or {"args", "error"} dict per job, in order.
+    """
+    if workers <= 1:
+        results = []
+        for args in jobs:
+            try:
+                results.append({"args": list(args), "result": job(*args)})
+            except Exception as e:
+                results.append({"args": list(args), "error": str(e)})
+        return results
+
+    pool = get_executor(workers)
+    futures = [pool.submit(job, *args) for args in jobs]
+    results = []
+    for args, future in zip(jobs, futures):
+        try:
+            results.append({"args": list(args), "result": future.result()})
+        except Exception as e:
+            results.append({"args": list(args), "error": str(e)})
+    return results
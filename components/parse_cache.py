@@ -0,0 +1,320 @@
+"""
+Process-wide cache of parsed TD workbooks, shared by /api/convert-file, /api/generate-pdf and
+/api/generate-rfid-pdf.
+
+Entries are keyed on the file's real path, size, mtime and SHA-256 of its contents, so an edited
+workbook is a miss (and its old entry is dropped) even when the editor keeps the mtime. A miss
+reads the workbook once and keeps the sheet frames plus the footer ranges; the first generator
+to ask for the TagSheetModels builds them and the raw frames are released. Entries are
+evicted least recently used first to stay under TD_PARSE_CACHE_MB (0 disables caching).
+
+Processed workbooks are also written to a columnar sidecar next to the source (see
+components.tag_sidecar), which a miss loads before falling back to parsing the xlsx.
+
+When a workbook is edited, its new version is processed against the models of the old one
+(kept from the invalidated entry, or read from the now stale sidecar), so only tag columns
+whose cells changed are re-encoded. A request for some sheets only reads those sheets of an
+edited workbook and takes the others from the old version's models.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from components.bottom_left_tables import extract_tag_and_tin_ranges, tag_and_tin_ranges_from_rows
+from components.parallel_jobs import process_td_sheets, process_workbook_sheets
+from components.tag_sheet_model import TagSheetModel, build_tag_sheet_model
+from components.tag_sidecar import SIDECARS_ENABLED, load_sidecar, write_sidecar
+from components.workbook_ingest import (TDSheet, get_reader_backend, iter_td_sheets, stream_workbook, td_sheet_from_rows,
+                                       workbook_sheet_names)
+
+DEFAULT_BUDGET_MB = 256
+HASH_CHUNK = 1 << 20
+
+
+@dataclass(frozen=True)
+class SourceKey:
+    path: str
+    size: int
+    mtime_ns: int
+    sha256: str
+
+
+def source_key(path: str) -> SourceKey:
+    path = os.path.normcase(os.path.realpath(path))
+    st = os.stat(path)
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            digest.update(chunk)
+    return SourceKey(path, st.st_size, st.st_mtime_ns, digest.hexdigest())
+
+
+@dataclass
+class ParsedWorkbook:
+    key: SourceKey
+    ranges: tuple                                       # extract_tag_and_tin_ranges result
+    td_sheets: Optional[List[TDSheet]] = None           # released once models is set
+    models: Optional[List[Tuple[str, str, Optional[TagSheetModel]]]] = None
+    nbytes: int = 0
+    source: str = "workbook"                            # where the models came from: workbook / sidecar
+
+    def measure(self) -> int:
+        frames = [s.df for s in self.td_sheets or []] + [m.to_frame() for _, _, m in self.models or [] if m is not None]
+        self.nbytes = sum(int(df.memory_usage(index=True, deep=True).sum()) for df in frames)
+        return self.nbytes
+
+
+def _sidecar_models(processed) -> List[Tuple[str, str, Optional[TagSheetModel]]]:
+    return [(name, title, None if df is None else TagSheetModel.from_frame(name, df, fingerprints))
+            for name, title, df, fingerprints in processed]
+
+
+def parse_workbook(key: SourceKey) -> ParsedWorkbook:
+    """Reads the workbook once for both the sheet frames and the footer ranges."""
+    backend = get_reader_backend()
+    if backend == "pandas":
+        return ParsedWorkbook(key, extract_tag_and_tin_ranges(key.path, backend),
+                              list(iter_td_sheets(key.path, backend=backend)))
+
+    sheets = [(name, list(rows)) for name, rows in stream_workbook(key.path)]
+    return ParsedWorkbook(key, tag_and_tin_ranges_from_rows(sheets),
+                          [td_sheet_from_rows(name, rows) for name, rows in sheets])
+
+
+class ParseCache:
+    def __init__(self, budget_bytes: int = DEFAULT_BUDGET_MB << 20, sidecars: bool = SIDECARS_ENABLED):
+        self.budget_bytes = budget_bytes
+        self.sidecars = sidecars
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.sidecar_loads = 0
+        self.sidecar_writes = 0
+        self.columns_reused = 0
+        self.columns_encoded = 0
+        self._entries = OrderedDict()       # SourceKey -> ParsedWorkbook
+        self._by_path = {}                  # path -> current SourceKey
+        self._previous = {}                 # path -> models of the invalidated version, until the new one is processed
+        self._loading = {}                  # SourceKey -> lock held while parsing / processing
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.budget_bytes > 0
+
+    @contextmanager
+    def _loading_lock(self, key: SourceKey):
+        # One parse per workbook even when its requests arrive together
+        with self._lock:
+            lock = self._loading.setdefault(key, threading.Lock())
+        with lock:
+            yield
+        with self._lock:
+            self._loading.pop(key, None)
+
+    def _lookup(self, key: SourceKey) -> Optional[ParsedWorkbook]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+            return entry
+
+    def _store(self, entry: ParsedWorkbook):
+        with self._lock:
+            old = self._entries.pop(entry.key, None)
+            if old is not None:
+                self.nbytes -= old.nbytes
+            stale = self._by_path.get(entry.key.path)
+            if stale is not None and stale != entry.key and stale in self._entries:
+                stale_entry = self._entries.pop(stale)
+                self.nbytes -= stale_entry.nbytes
+                self.invalidations += 1
+                if stale_entry.models is not None:
+                    self._previous[entry.key.path] = stale_entry.models
+            self._by_path[entry.key.path] = entry.key
+            self._entries[entry.key] = entry
+            self.nbytes += entry.measure()
+            self._evict(self.budget_bytes)
+
+    def _evict(self, budget_bytes: int):
+        # Caller holds self._lock
+        while self._entries and self.nbytes > max(budget_bytes, 0):
+            key, evicted = self._entries.popitem(last=False)
+            self.nbytes -= evicted.nbytes
+            if self._by_path.get(key.path) == key:
+                del self._by_path[key.path]
+            self.evictions += 1
+
+    def _entry(self, key: SourceKey, parse: bool = True) -> Optional[ParsedWorkbook]:
+        """The cached entry, else the sidecar's, else (with `parse`) a fresh parse of the workbook."""
+        entry = self._lookup(key)
+        if entry is None:
+            stored = load_sidecar(key.path, key.size, key.sha256) if self.sidecars else None
+            if stored is not None:
+                processed, ranges = stored
+                entry = ParsedWorkbook(key, ranges, models=_sidecar_models(processed), source="sidecar")
+                with self._lock:
+                    self.sidecar_loads += 1
+            elif parse:
+                entry = parse_workbook(key)
+            else:
+                return None
+            self._store(entry)
+        return entry
+
+    def _previous_models(self, key: SourceKey, consume: bool = True) -> dict:
+        """
+        Sheet name -> (tag_title, TagSheetModel or None) of the last processed version of the
+        workbook at key.path. `consume` drops the in-memory copy once the new version is built.
+        """
+        with self._lock:
+            models = self._previous.pop(key.path, None) if consume else self._previous.get(key.path)
+            stale = self._entries.get(self._by_path.get(key.path))
+            if models is None and stale is not None and stale.key != key:
+                models = stale.models
+        if models is None and self.sidecars:
+            stored = load_sidecar(key.path, any_source=True)
+            if stored is not None:
+                models = _sidecar_models(stored[0])
+        return {name: (title, model) for name, title, model in models or []}
+
+    def _build_selected(self, key: SourceKey, workers: int, sheets):
+        """
+        Models of a workbook that is not parsed yet, reading only `sheets` (and any other sheet
+        the previous version did not have). The rest are the previous version's models, as the
+        last outputs were rendered from them. Nothing is cached, as the result is partly stale.
+        """
+        previous = self._previous_models(key, consume=False)
+        names = workbook_sheet_names(key.path)
+        load = [name for name in names if name in sheets or name not in previous]
+        built = {sheet_name: (title, model) for sheet_name, title, model in process_td_sheets(
+            list(iter_td_sheets(key.path, load)), build_tag_sheet_model, workers,
+            {name: model for name, (_, model) in previous.items() if model is not None})}
+        merged = [name for name in names if name not in built]
+        print(f"Loaded sheets {load} of {key.path}; {merged} kept from the previous run")
+
+        models = [(name, *(built[name] if name in built else previous[name])) for name in names]
+        reused = sum(len(m) if name in merged else m.reused_columns for name, _, m in models if m is not None)
+        report = _reuse_report("workbook", models, reused)
+        with self._lock:
+            self.columns_reused += report["columns_reused"]
+            self.columns_encoded += report["columns_encoded"]
+        return models, dict(report, sheets_loaded=load, sheets_merged=merged)
+
+    def sheet_models(self, path: str, workers: int = 0, sheets=None) -> List[Tuple[str, str, Optional[TagSheetModel]]]:
+        """
+        (sheet_name, tag_title, TagSheetModel or None) per sheet, in workbook order. Models are
+        shared between requests and must not be modified. With `sheets`, only those sheets need
+        to be current; see sheet_models_with_reuse.
+        """
+        return self.sheet_models_with_reuse(path, workers, sheets)[0]
+
+    def sheet_models_with_reuse(self, path: str, workers: int = 0, sheets=None):
+        """
+        sheet_models(path) plus a report of the work reused: where the models came from
+        ("memory", "sidecar" or "workbook"), and how many tag columns were copied from the
+        previous version of the workbook rather than encoded.
+
+        `sheets` (sheet names) limits what is read when the workbook has changed: the other
+        sheets keep the previous version's models (listed as sheets_merged in the report).
+        When the current version is cached or has a sidecar, every sheet is current anyway.
+        """
+        if not self.enabled:
+            if sheets is not None:
+                return self._build_selected(source_key(path), workers, sheets)
+            models = list(process_workbook_sheets(path, build_tag_sheet_model, workers))
+            return models, _reuse_report("workbook", models, 0)
+
+        key = source_key(path)
+        with self._loading_lock(key):
+            cached = self._lookup_models(key)
+            entry = cached or self._entry(key, parse=sheets is None)
+            if entry is None:
+                return self._build_selected(key, workers, sheets)
+            if entry.models is None:
+                previous = {name: model for name, (_, model) in self._previous_models(key).items() if model is not None}
+                entry.models = list(process_td_sheets(entry.td_sheets, build_tag_sheet_model, workers, previous))
+                entry.td_sheets = None
+                self._store(entry)
+                report = _reuse_report("workbook", entry.models,
+                                       sum(m.reused_columns for _, _, m in entry.models if m is not None))
+                with self._lock:
+                    self.columns_reused += report["columns_reused"]
+                    self.columns_encoded += report["columns_encoded"]
+                processed = [(name, title, None if m is None else m.to_frame(), [] if m is None else m.fingerprints)
+                             for name, title, m in entry.models]
+                if self.sidecars and write_sidecar(key.path, key.size, key.sha256, processed, entry.ranges):
+                    with self._lock:
+                        self.sidecar_writes += 1
+                return entry.models, report
+            return entry.models, _reuse_report("memory" if cached else entry.source, entry.models)
+
+    def _lookup_models(self, key: SourceKey) -> Optional[ParsedWorkbook]:
+        # A hit only counts as in-memory reuse when the models were already built
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.models is None:
+                return None
+        return self._lookup(key)
+
+    def tag_and_tin_ranges(self, path: str) -> tuple:
+        """extract_tag_and_tin_ranges(path), from the cached parse of the workbook."""
+        if not self.enabled or not path or not os.path.isfile(path):
+            return extract_tag_and_tin_ranges(path)
+
+        key = source_key(path)
+        with self._loading_lock(key):
+            return self._entry(key).ranges
+
+    def resize(self, budget_bytes: int):
+        with self._lock:
+            self.budget_bytes = budget_bytes
+            self._evict(budget_bytes)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_path.clear()
+            self._previous.clear()
+            self.nbytes = 0
+            self.hits = self.misses = self.evictions = self.invalidations = 0
+            self.sidecar_loads = self.sidecar_writes = 0
+            self.columns_reused = self.columns_encoded = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "nbytes": self.nbytes,
+                "budget_bytes": self.budget_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "sidecar_loads": self.sidecar_loads,
+                "sidecar_writes": self.sidecar_writes,
+                "columns_reused": self.columns_reused,
+                "columns_encoded": self.columns_encoded,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+def _reuse_report(source: str, models, reused: int = None) -> dict:
+    """`reused`: tag columns copied from the previous version (None when the models were already built)."""
+    columns = sum(len(m) for _, _, m in models if m is not None)
+    if reused is None:
+        reused = columns
+    return {"source": source, "columns": columns, "columns_reused": reused, "columns_encoded": columns - reused}
+
+
+PARSE_CACHE = ParseCache(int(float(os.environ.get("TD_PARSE_CACHE_MB", DEFAULT_BUDGET_MB)) * (1 << 20)))
@@ -0,0 +1,72 @@
+"""
+Registry of TD sheet types, matched to sheets by their row labels rather than the sheet name.
+
+Every layout in calculations.layouts is registered here. A sheet is encoded with the type whose
+field labels it carries (so a renamed NT sheet is still an NT sheet); a sheet that carries
+no type's labels falls back to the type of the same name, and is otherwise not a tag sheet.
+To add a tag type (LC, Junction), declare its TagLayout in LAYOUTS; rows it reads but does not
+encode go in RESERVED_ROWS.
+"""
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Tuple
+
+from calculations.bit_layout import TagLayout, parse_bit_position
+from calculations.layouts import LAYOUTS
+
+# Share of a type's field labels a sheet must carry to be detected as that type
+MIN_LABEL_MATCH = 0.75
+
+# Absolute location rows may say UNKNOWN, which reads as 0
+UNKNOWN_AS_ZERO = {'fAbsLoc', 'fAbsLoc1', 'fAbsLoc2'}
+
+# Rows that must hold integers but are never encoded: (read position, name, label, bit position)
+RESERVED_ROWS = {
+    'AdjT': ((10, 'reserved', 'Reserved', 'Y22 - Y21'),
+             (13, 'reserved1', 'Reserved_1', 'Y30 - Y27')),
+}
+
+
+@dataclass(frozen=True)
+class SheetType:
+    name: str
+    layout: TagLayout
+    # (field name, row label, default, UNKNOWN reads as 0, width) in the order the rows are
+    # converted, so a tag with several bad cells always reports the same one
+    fields: Tuple[tuple, ...]
+    labels: frozenset
+
+    def match(self, labels: set) -> float:
+        """Share of this type's field labels present in `labels`."""
+        return len(self.labels & labels) / len(self.labels) if self.labels else 0.0
+
+
+SHEET_TYPES: Dict[str, SheetType] = {}
+
+
+def register_sheet_type(layout: TagLayout, reserved=()) -> SheetType:
+    fields = [(f.name, f.label, f.default, f.name in UNKNOWN_AS_ZERO, f.width) for f in layout.fields]
+    for index, name, label, bit_position in reserved:
+        fields.insert(index, (name, label, 0, False, sum(r.width for r in parse_bit_position(bit_position))))
+    sheet_type = SheetType(layout.name, layout, tuple(fields), frozenset(layout.labels.values()))
+    SHEET_TYPES[layout.name] = sheet_type
+    return sheet_type
+
+
+def detect_sheet_type(sheet_name: str, labels: Iterable) -> Optional[SheetType]:
+    """
+    The registered type whose field labels the sheet's row `labels` cover best (at least
+    MIN_LABEL_MATCH of them; ties go to more labels matched, then to the sheet's name),
+    else the type named `sheet_name`, else None.
+    """
+    labels = {str(label).strip() for label in labels}
+    best, best_score = None, None
+    for sheet_type in SHEET_TYPES.values():
+        share = sheet_type.match(labels)
+        score = (share, len(sheet_type.labels & labels), sheet_type.name == sheet_name)
+        if share >= MIN_LABEL_MATCH and (best_score is None or score > best_score):
+            best, best_score = sheet_type, score
+    return best or SHEET_TYPES.get(sheet_name)
+
+
+for _layout in LAYOUTS.values():
+    register_sheet_type(_layout, RESERVED_ROWS.get(_layout.name, ()))
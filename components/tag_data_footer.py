@@ -1,9 +1,98 @@
 import copy
+import os
 import re
+import threading
+from dataclasses import dataclass
+from typing import Optional, Tuple
 from openpyxl import load_workbook, Workbook
 from openpyxl.utils import range_boundaries
 from openpyxl.utils.cell import range_boundaries
-from openpyxl.styles import Alignment, Font
+from openpyxl.styles import Alignment, Border
+from components.excel_styles import footer_font
+from components.tag_sheet_layout import add_merged_range
+
+FOOTER_TEMPLATE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "files", "template.xlsx")
+FOOTER_TEMPLATE_RANGE = "A2:O6"
+PLACEHOLDER_PATTERN = re.compile(r"{{(.*?)}}")
+
+
+
+@dataclass(frozen=True)
+class CellPlan:
+    segments: Tuple[str, ...]       # literal text around the placeholders, one more than slots
+    slots: Tuple[int, ...]          # slot of each placeholder, in order
+    sole: Optional[int]             # the slot when the cell is that one placeholder and whitespace
+
+    def fill(self, texts) -> str:
+        """The cell's text with slot i replaced by texts[i]."""
+        if not self.slots:
+            return self.segments[0]
+        parts = [self.segments[0]]
+        for slot, segment in zip(self.slots, self.segments[1:]):
+            parts += (texts[slot], segment)
+        return "".join(parts)
+
+
+@dataclass(frozen=True)
+class FooterPlan:
+    """
+    A footer template compiled once: one slot per distinct placeholder name, and per template cell
+    the literal segments between its slots, so filling a cell is a single join.
+    """
+    names: Tuple[str, ...]          # placeholder name of each slot
+    cells: Tuple[Tuple[CellPlan, ...], ...]
+
+    def resolve(self, variables, default_size, newline=None):
+        """
+        Per slot: its value's text, font size and position in `variables`. Values are either plain
+        (size None) or {"value": ..., "size": ...} (size `default_size` when not given). A name
+        missing from `variables` stays as the placeholder, with size None and position -1.
+        `newline` replaces line breaks in the values.
+        """
+        order = {key: i for i, key in enumerate(variables)}
+        texts, sizes, ranks = [], [], []
+        for name in self.names:
+            if name not in variables:
+                texts.append(f"{{{{{name}}}}}")
+                sizes.append(None)
+                ranks.append(-1)
+                continue
+            val = variables[name]
+            if isinstance(val, dict):
+                text, size = str(val.get("value", "")), val.get("size", default_size)
+            else:
+                text, size = str(val), None
+            texts.append(text if newline is None else text.replace("\n", newline))
+            sizes.append(size)
+            ranks.append(order[name])
+        return texts, sizes, ranks
+
+
+def compile_footer_plan(template_cells) -> FooterPlan:
+    slots = {}
+    rows = []
+    for row in template_cells:
+        plans = []
+        for cell in row:
+            # split() with one group alternates literal text and placeholder names
+            parts = PLACEHOLDER_PATTERN.split(cell["value"])
+            segments = tuple(parts[0::2])
+            ids = tuple(slots.setdefault(name, len(slots)) for name in parts[1::2])
+            sole = ids[0] if len(ids) == 1 and not "".join(segments).strip() else None
+            plans.append(CellPlan(segments, ids, sole))
+        rows.append(tuple(plans))
+    return FooterPlan(tuple(slots), tuple(rows))
+
+
+def footer_plan(template_data) -> FooterPlan:
+    """The template's compiled plan (compiled here for a template built by hand)."""
+    plan = template_data.get("plan")
+    return plan if plan is not None else compile_footer_plan(template_data["template"])
+
+
+# (real path, range) -> ((mtime_ns, size), template data)
+_template_cache = {}
+_template_cache_lock = threading.Lock()
 
 
 def extract_template_with_placeholders(file_path, range_str):
@@ -22,8 +111,9 @@ def extract_template_with_placeholders(file_path, range_str):
         row = []
         for c in range(min_col, max_col + 1):
             cell = ws.cell(row=r, column=c)
+            value = str(cell.value) if cell.value is not None else ""
             row.append({
-                "value": str(cell.value) if cell.value is not None else "",
+                "value": value,
                 "font": copy.copy(cell.font),
                 "border": copy.copy(cell.border),
                 "fill": copy.copy(cell.fill),
@@ -40,20 +130,47 @@ def extract_template_with_placeholders(file_path, range_str):
         "template": template_cells,
         "start_row": min_row,
         "start_col": min_col,
-        "merged_cells": merged_ranges
+        "merged_cells": merged_ranges,
+        "plan": compile_footer_plan(template_cells),
     }
 
 
+def footer_template_version(file_path=FOOTER_TEMPLATE_PATH):
+    """(mtime_ns, size) of the template file; load_footer_template reloads when it changes."""
+    st = os.stat(os.path.realpath(file_path))
+    return st.st_mtime_ns, st.st_size
+
+
+def load_footer_template(file_path=FOOTER_TEMPLATE_PATH, range_str=FOOTER_TEMPLATE_RANGE):
+    """
+    extract_template_with_placeholders, loaded once per process and reused until the template
+    file's mtime (or size) changes. Callers share the returned template and must not modify it.
+    """
+    path = os.path.realpath(file_path)
+    version = footer_template_version(path)
+    key = (path, range_str)
+    with _template_cache_lock:
+        cached = _template_cache.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+    # Loaded outside the lock; two threads missing at once both load and the later one is kept
+    template_data = extract_template_with_placeholders(path, range_str)
+    with _template_cache_lock:
+        _template_cache[key] = (version, template_data)
+    return template_data
+
+
+def clear_footer_templates():
+    with _template_cache_lock:
+        _template_cache.clear()
+
+
 def extract_placeholders(template_data):
     """
     Scans the template for all {{placeholders}} and returns a unique list of field names.
     """
-    placeholders = set()
-    for row in template_data["template"]:
-        for cell in row:
-            matches = re.findall(r"{{(.*?)}}", cell["value"])
-            placeholders.update(matches)
-    return list(placeholders)
+    return list(footer_plan(template_data).names)
 
 
 def generate_excel_from_template(template_data, output_path, variables: dict):
@@ -90,59 +207,47 @@ def generate_excel_from_template(template_data, output_path, variables: dict):
     print(f"✅ File saved: {output_path}")
 
 
-def insert_footer_into_worksheet(ws, template_data, variables, start_row):
+def fill_footer(template_data, variables):
+    """
+    Rows of (text, font size) of the template cells with their placeholders replaced. A cell that
+    is just one placeholder takes that value's font size; every other cell is size 11.
+    """
+    plan = footer_plan(template_data)
+    texts, sizes, _ = plan.resolve(variables, 11)
+    rows = []
+    for row in plan.cells:
+        filled = []
+        for cell in row:
+            size = sizes[cell.sole] if cell.sole is not None else None
+            filled.append((cell.fill(texts), 11 if size is None else size))
+        rows.append(filled)
+    return rows
+
+
+def insert_footer_into_worksheet(ws, template_data, variables, start_row, styles=None):
     """
     Inserts the footer into an existing worksheet (ws) at the specified start_row.
     Ensures that all text, including merged cells, is center-aligned and each row is at least 30 height.
     Supports custom font sizes for dynamic values using {"value": ..., "size": ...}
+    With `styles` (a components.excel_styles.StyleRegistry), cells get named styles.
     """
     start_col = template_data["start_col"]
     template = template_data["template"]
     original_start_row = template_data["start_row"]
 
-    for r_idx, row in enumerate(template):
-        for c_idx, cell_data in enumerate(row):
+    for r_idx, (row, filled) in enumerate(zip(template, fill_footer(template_data, variables))):
+        for c_idx, (cell_data, (value, font_size)) in enumerate(zip(row, filled)):
             row_num = start_row + r_idx
             col_num = start_col + c_idx
             cell = ws.cell(row=row_num, column=col_num)
 
-            # Get original template value
-            original_text = cell_data["value"]
-            final_text = original_text
-            applied_font_size = 11  # default
-
-            # Replace placeholders with values
-            for key, val in variables.items():
-                placeholder = f"{{{{{key}}}}}"
-                if placeholder in final_text:
-                    # Support for {"value": ..., "size": ...}
-                    if isinstance(val, dict):
-                        replacement_text = str(val.get("value", ""))
-                        font_size = val.get("size", 11)
-                    else:
-                        replacement_text = str(val)
-                        font_size = 11
-
-                    final_text = final_text.replace(placeholder, replacement_text)
-
-                    # If entire cell is just this placeholder, use its font size
-                    if original_text.strip() == placeholder:
-                        applied_font_size = font_size
-
-            cell.value = final_text
+            cell.value = value
+            if styles is not None:
+                cell.style = styles.footer_style(cell_data, font_size)
+                continue
 
             # Apply original font settings with modified font size
-            original_font = cell_data["font"]
-            cell.font = Font(
-                name=original_font.name,
-                bold=original_font.bold,
-                italic=original_font.italic,
-                vertAlign=original_font.vertAlign,
-                underline=original_font.underline,
-                strike=original_font.strike,
-                color=original_font.color,
-                size=applied_font_size  # 👈 custom font size
-            )
+            cell.font = footer_font(cell_data["font"], font_size)
 
             # Apply other styles
             cell.fill = cell_data["fill"]
@@ -158,8 +263,66 @@ def insert_footer_into_worksheet(ws, template_data, variables, start_row):
         row_offset = start_row - original_start_row
 
         new_merge_range = f"{ws.cell(row=min_row + row_offset, column=min_col).coordinate}:{ws.cell(row=max_row + row_offset, column=max_col).coordinate}"
-        ws.merge_cells(new_merge_range)
+        add_merged_range(ws, new_merge_range)
+
+        # Set alignment for merged cell (a named style has it already)
+        if styles is None:
+            merged_top_left_cell = ws.cell(row=min_row + row_offset, column=min_col)
+            merged_top_left_cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
 
-        # Set alignment for merged cell
-        merged_top_left_cell = ws.cell(row=min_row + row_offset, column=min_col)
-        merged_top_left_cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
+
+def footer_rows(template_data, variables, styles):
+    """
+    The cells insert_footer_into_worksheet leaves behind, as rows of {column: (value, style name)}
+    from its start row on (`styles` is the workbook's StyleRegistry), for writers that cannot merge
+    after writing (a write-only worksheet). Cells merged into another are empty but for the edge
+    borders that merging gives them, as openpyxl's MergedCellRange.format() does. Also returns the
+    merged ranges relative to the start row, as (min_col, row offset, max_col, row offset).
+    """
+    start_col = template_data["start_col"]
+    original_start_row = template_data["start_row"]
+    rows = []
+    for row, filled in zip(template_data["template"], fill_footer(template_data, variables)):
+        cells = {}
+        for c_idx, (cell_data, (value, font_size)) in enumerate(zip(row, filled)):
+            cells[start_col + c_idx] = (value, styles.footer_style(cell_data, font_size))
+        rows.append(cells)
+
+    merges = []
+    for merge in template_data["merged_cells"]:
+        min_col, min_row, max_col, max_row = range_boundaries(merge)
+        min_row -= original_start_row
+        max_row -= original_start_row
+        merges.append((min_col, min_row, max_col, max_row))
+        while len(rows) <= max_row:
+            rows.append({})
+        start_data = _template_cell(template_data, min_row, min_col - start_col)
+        start_border = start_data["border"] if start_data is not None else Border()
+        borders = {}
+        edges = {
+            'top': [(min_row, c) for c in range(min_col, max_col + 1)],
+            'left': [(r, min_col) for r in range(min_row, max_row + 1)],
+            'right': [(r, max_col) for r in range(min_row, max_row + 1)],
+            'bottom': [(max_row, c) for c in range(min_col, max_col + 1)],
+        }
+        for name, coords in edges.items():
+            side = getattr(start_border, name)
+            if side and side.style is None:
+                continue
+            border = Border(**{name: side})
+            for coord in coords:
+                borders[coord] = borders.get(coord, Border()) + border
+        # The top-left cell keeps its own style; the rest are merged cells with only a border
+        for r in range(min_row, max_row + 1):
+            for c in range(min_col, max_col + 1):
+                if (r, c) != (min_row, min_col):
+                    border = borders.get((r, c))
+                    rows[r][c] = (None, None if border is None else styles.style("TD footer border", border=border))
+    return rows, merges
+
+
+def _template_cell(template_data, r_idx, c_idx):
+    template = template_data["template"]
+    if 0 <= r_idx < len(template) and 0 <= c_idx < len(template[r_idx]):
+        return template[r_idx][c_idx]
+    return None
@@ -0,0 +1,103 @@
+from flask import request, jsonify
+import re
+import os
+from calculations.decoder import verify_tags
+from components.sheet_types import detect_sheet_type
+from components.workbook_ingest import read_raw_workbook
+
+TAG_COLUMN_RE = re.compile(r"^\d+/[MD]$")
+HEADER_LABEL = "FIELD NAME / DESCRIPTION"
+RESULT_LABELS = {"CRC", "PAGE -X", "PAGE -Y"}
+
+
+def read_formatted_sheet(raw_df):
+    """
+    Collects every tag column of a formatted TD sheet (all 10-tag chunks).
+    Returns (tag_names, {row label: [cell per tag]}).
+    """
+    labels = raw_df.iloc[:, 0].astype(str).str.strip().tolist()
+    values = raw_df.to_numpy(dtype=object)
+    tag_names = []
+    rows = {}
+
+    header_rows = [i for i, label in enumerate(labels) if label == HEADER_LABEL]
+    for h in header_rows:
+        tag_cols = [c for c in range(1, values.shape[1]) if TAG_COLUMN_RE.match(str(values[h, c]).strip())]
+        if not tag_cols:
+            continue
+        start = len(tag_names)
+        tag_names.extend(str(values[h, c]).strip() for c in tag_cols)
+
+        r = h + 1
+        while r < len(labels) and labels[r] not in ("nan", "", HEADER_LABEL):
+            cells = rows.setdefault(labels[r], [])
+            if len(cells) <= start:
+                cells.extend([None] * (start - len(cells)))
+                cells.extend(values[r, c] for c in tag_cols)
+            if labels[r] == "PAGE -Y":
+                break
+            r += 1
+
+    for cells in rows.values():
+        cells.extend([None] * (len(tag_names) - len(cells)))
+    return tag_names, rows
+
+
+def verify_td_workbook(input_path):
+    """
+    Checks the CRC, PAGE -X and PAGE -Y rows of every tag in a formatted TD workbook against
+    its field rows. Returns a summary with the list of mismatches.
+    """
+    all_raw = read_raw_workbook(input_path)
+    mismatches = []
+    sheets = {}
+    skipped = []
+
+    for sheet_name, raw_df in all_raw.items():
+        if raw_df.empty:
+            skipped.append(sheet_name)
+            continue
+
+        tag_names, rows = read_formatted_sheet(raw_df)
+        sheet_type = detect_sheet_type(sheet_name, rows.keys())
+        if sheet_type is None or not tag_names or not RESULT_LABELS <= rows.keys():
+            skipped.append(sheet_name)
+            continue
+
+        layout = sheet_type.layout
+        fields = {name: rows[label] for name, label in layout.labels.items() if label in rows}
+        sheet_mismatches = verify_tags(
+            layout.name, tag_names, fields,
+            rows["PAGE -X"], rows["PAGE -Y"], rows["CRC"]
+        )
+        for m in sheet_mismatches:
+            m["sheet"] = sheet_name
+        mismatches.extend(sheet_mismatches)
+        sheets[sheet_name] = {"tags": len(tag_names), "mismatches": len(sheet_mismatches)}
+
+    return {
+        "tags_checked": sum(s["tags"] for s in sheets.values()),
+        "sheets": sheets,
+        "skipped_sheets": skipped,
+        "mismatches": mismatches,
+    }
+
+
+def verify_tag_data():
+    try:
+        input_path = request.form.get('input_path')
+        if not input_path:
+            return jsonify({"error": "Missing input path"}), 400
+
+        if not input_path.endswith('.xlsx'):
+            return jsonify({"error": "Invalid input file format. Please provide an .xlsx file path"}), 400
+
+        if not os.path.isfile(input_path):
+            return jsonify({"error": "Input file does not exist"}), 400
+
+        result = verify_td_workbook(input_path)
+        result["valid"] = not result["mismatches"]
+        return jsonify(result), 200
+
+    except Exception as e:
+        return jsonify({"error": f"Verification failed: {str(e)}"}), 500
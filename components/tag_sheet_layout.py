@@ -0,0 +1,156 @@
+"""
+Where format_sheet puts everything on a formatted TD sheet, worked out from the sheet's values
+instead of read back from written cells, so a write-only worksheet can be given it up front.
+
+A sheet is one block per CHUNK_SIZE tag columns: a title row merged across TITLE_COLUMNS, the
+field table (header row, then one row per field; column A is merged over A:C), FOOTER_GAP empty
+rows, the footer template and CHUNK_GAP empty rows. Column widths are set per block, so the last
+block's widths are the ones the sheet keeps.
+
+sheet_layout measures the whole sheet up front with numpy string operations: text length and
+line count of every cell, then the longest value per tag column of the last block and the most
+lines per field table row of each block. Writers apply the result without reading cells back.
+The layout's merged ranges never overlap, so add_merged_range adds them without openpyxl's check
+against every range already merged, which grows with the square of a sheet's merges.
+"""
+from dataclasses import dataclass
+from math import ceil
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+from openpyxl.utils import get_column_letter
+from openpyxl.utils.dataframe import dataframe_to_rows
+from openpyxl.worksheet.cell_range import CellRange, MultiCellRange
+from openpyxl.worksheet.merge import MergedCellRange
+from openpyxl.worksheet.worksheet import Worksheet
+
+from components.tag_sheet_model import CHUNK_SIZE, PREDEFINED_COLUMNS
+
+TITLE_COLUMNS = 15
+TITLE_HEIGHT = 25
+LABEL_COLUMNS = 3                   # column A of the field table is merged over A:C
+FIXED_WIDTHS = {'A': 20, 'B': 20, 'C': 20, 'D': 35, 'E': 35}
+MIN_TAG_WIDTH = 20
+MAX_TAG_WIDTH = 40
+FIRST_TAG_COLUMN = 6
+FOOTER_GAP = 3
+CHUNK_GAP = 6
+LINE_CHARS = 40                     # a field table row gets a line per 40 characters
+LAYOUT_BLOCK = 50 * CHUNK_SIZE      # tag columns measured at a time, so the str copies stay small
+
+
+@dataclass
+class ChunkLayout:
+    page: int                       # 1-based
+    title_row: int
+    rows: List[list]                # header row, then field rows, as dataframe_to_rows yields them
+    row_heights: List[int]          # one per entry of rows
+    footer_row: int
+
+
+@dataclass
+class SheetLayout:
+    column_widths: Dict[str, int]   # column letter -> width the sheet ends up with
+    row_heights: np.ndarray         # (chunks, field table rows), header row first
+
+
+def table_columns(values_row) -> List[int]:
+    """Worksheet column of each value of a field table row: A, then D, E, F, ..."""
+    return [1] + [c + LABEL_COLUMNS - 1 for c in range(2, len(values_row) + 1)]
+
+
+def text_metrics(values: np.ndarray):
+    """
+    Length and lines (line breaks + 1, or a line per LINE_CHARS characters when more) of str() of
+    each cell of an object array; 0 and 1 for falsy cells, which format_sheet never measured.
+    """
+    present = values.astype(bool)
+    text = values.astype(str)
+    lengths = np.where(present, np.char.str_len(text), 0)
+    lines = np.where(present, np.maximum(np.char.count(text, '\n') + 1, lengths // LINE_CHARS + 1), 1)
+    return lengths, lines
+
+
+def row_heights(lines: np.ndarray) -> np.ndarray:
+    """Height of field table rows taking `lines` lines: 15 per line past two, else 40."""
+    return np.where(lines > 2, lines * 15 + 20, 40)
+
+
+def tag_column_names(df: pd.DataFrame) -> list:
+    return [col for col in df.columns if col not in PREDEFINED_COLUMNS]
+
+
+def chunk_frames(df: pd.DataFrame) -> Iterator[pd.DataFrame]:
+    tags = tag_column_names(df)
+    for start in range(0, len(tags), CHUNK_SIZE):
+        yield df[PREDEFINED_COLUMNS + tags[start:start + CHUNK_SIZE]]
+
+
+def _table(df: pd.DataFrame, columns: list) -> np.ndarray:
+    """Header row and values of `columns`, as dataframe_to_rows yields them, in an object array."""
+    header = np.empty((1, len(columns)), dtype=object)
+    header[0, :] = columns
+    return np.concatenate([header, df[columns].to_numpy(dtype=object)])
+
+
+def sheet_layout(df: pd.DataFrame) -> SheetLayout:
+    tags = tag_column_names(df)
+    chunks = ceil(len(tags) / CHUNK_SIZE)
+    if not chunks:
+        return SheetLayout({}, np.empty((0, len(df) + 1), dtype=int))
+
+    # Cells B and C of each row are merged into A and empty, so a row's lines are those of the
+    # predefined values and the chunk's tag values
+    fixed_lines = text_metrics(_table(df, PREDEFINED_COLUMNS))[1].max(axis=1)
+    lines = np.empty((chunks, len(df) + 1), dtype=int)
+    last = (chunks - 1) * CHUNK_SIZE
+    for start in range(0, len(tags), LAYOUT_BLOCK):
+        block = tags[start:start + LAYOUT_BLOCK]
+        lengths, block_lines = text_metrics(_table(df, block))
+        per_chunk = np.maximum.reduceat(block_lines, np.arange(0, len(block), CHUNK_SIZE), axis=1)
+        lines[start // CHUNK_SIZE:start // CHUNK_SIZE + per_chunk.shape[1]] = np.maximum(per_chunk.T, fixed_lines)
+        if start <= last:
+            # LAYOUT_BLOCK is a multiple of CHUNK_SIZE, so the last chunk sits in one block
+            last_lengths = lengths[:, last - start:].max(axis=0)
+
+    widths = dict(FIXED_WIDTHS)
+    for offset in range(CHUNK_SIZE):
+        max_length = int(last_lengths[offset]) if offset < len(last_lengths) else 0
+        widths[get_column_letter(FIRST_TAG_COLUMN + offset)] = max(MIN_TAG_WIDTH, min(max_length + 4, MAX_TAG_WIDTH))
+    return SheetLayout(widths, row_heights(lines))
+
+
+def iter_chunk_layouts(df: pd.DataFrame, footer_height: int, layout: Optional[SheetLayout] = None) -> Iterator[ChunkLayout]:
+    """Chunk layouts in sheet order, for a footer template `footer_height` rows tall."""
+    layout = layout if layout is not None else sheet_layout(df)
+    title_row = 1
+    for page, chunk in enumerate(chunk_frames(df), start=1):
+        rows = list(dataframe_to_rows(chunk, index=False, header=True))
+        footer_row = title_row + 1 + len(rows) + FOOTER_GAP
+        yield ChunkLayout(page, title_row, rows, layout.row_heights[page - 1].tolist(), footer_row)
+        title_row = footer_row + footer_height + CHUNK_GAP
+
+
+# Skipping the overlap check needs openpyxl 3.1 internals (pinned in requirements.txt): a set of
+# merged ranges and Worksheet._clean_merge_range. Without them merges take the public route.
+FAST_MERGES = isinstance(MultiCellRange().ranges, set) and hasattr(Worksheet, "_clean_merge_range")
+
+
+def add_merged_range(ws, coord: str):
+    """
+    ws.merge_cells(coord) for a range that overlaps no merged range on the sheet. A write-only
+    worksheet only records it; its cells are written as laid out.
+    """
+    write_only = ws.parent.write_only
+    if not FAST_MERGES:
+        if write_only:
+            ws.merged_cells.add(coord)
+        else:
+            ws.merge_cells(coord)
+    elif write_only:
+        ws.merged_cells.ranges.add(CellRange(coord))
+    else:
+        merged = MergedCellRange(ws, coord)
+        ws.merged_cells.ranges.add(merged)
+        ws._clean_merge_range(merged)
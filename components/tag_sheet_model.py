@@ -0,0 +1,341 @@
+"""
+TagSheetModel: one TD input sheet read and encoded once, for every renderer.
+
+build_tag_sheet_model does what the Excel and PDF generators' process_input_sheet copies
+did: reads the field rows and encodes the tags with the sheet's type (components.sheet_types,
+chosen by row labels; other sheets are skipped). The model keeps the field rows, encoded
+pages and CRCs. format_sheet and format_pdf_table render it through to_frame(), which is the
+frame process_input_sheet has always returned.
+
+Each tag column also gets a fingerprint of its input cells. Given the model built from the
+previous version of the workbook, build_tag_sheet_model copies the columns whose fingerprint
+is unchanged and re-encodes only the rest.
+"""
+import hashlib
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from calculations.batch import encode_layout_batch, format_crcs, format_pages
+from calculations.bit_layout import get_plan
+from components.sheet_types import detect_sheet_type
+
+PREDEFINED_COLUMNS = ["FIELD NAME / DESCRIPTION", "BIT POSITION", "Size (Bits)"]
+RESULT_ROWS = ["CRC", "PAGE -X", "PAGE -Y"]
+CHUNK_SIZE = 10                 # tag columns per rendered page / table
+BLANK_PAGE = '0 0 0 0 0 0 0 0'
+
+
+@dataclass
+class TagSheetModel:
+    sheet_name: str
+    field_desc: List[str]           # row labels, in sheet order
+    bit_positions: list
+    sizes: list
+    tag_names: List[str]
+    field_values: List[list]        # per tag: one value per field row
+    crcs: list                      # per tag: CRC hex string (0 when the tag could not be encoded)
+    pages_x: List[str]
+    pages_y: List[str]
+    fingerprints: List[str] = field(default_factory=list)     # per tag: digest of its input cells
+    reused_columns: int = field(default=0, compare=False)       # copied from the previous model
+    _frame: Optional[pd.DataFrame] = field(default=None, init=False, repr=False, compare=False)
+
+    def __len__(self):
+        return len(self.tag_names)
+
+    def __getstate__(self):
+        # to_frame() rebuilds the cached frame, so a pickled model never carries it
+        return {**self.__dict__, "_frame": None}
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        The formatted TD sheet frame (field rows, then CRC / PAGE -X / PAGE -Y). Built once and
+        shared, so it must not be modified.
+        """
+        if self._frame is None:
+            frame = pd.DataFrame({
+                "FIELD NAME / DESCRIPTION": self.field_desc + RESULT_ROWS,
+                "BIT POSITION": list(self.bit_positions) + ["Y63 - Y34", "", ""],
+                "Size (Bits)": list(self.sizes) + [30, 64, 64]
+            })
+            if self.tag_names:
+                tag_data = {
+                    name: values + [crc, page_x, page_y]
+                    for name, values, crc, page_x, page_y
+                    in zip(self.tag_names, self.field_values, self.crcs, self.pages_x, self.pages_y)
+                }
+                frame = pd.concat([frame, pd.DataFrame(tag_data, index=frame.index)], axis=1)
+            self._frame = frame
+        return self._frame
+
+    def chunk_fingerprints(self, tag_title: str, chunk_size: int = CHUNK_SIZE) -> List[str]:
+        """
+        One digest per `chunk_size` tag columns (a rendered page / table), covering the sheet's
+        header columns, the total chunk count in the footer, and each tag's name, input cells
+        (fingerprint), CRC and pages. Renderer changes are not covered (see RENDER_VERSION in
+        file_generators.tag_data_batch_generator).
+        """
+        total = -(-len(self.tag_names) // chunk_size)
+        # str(), not repr(): a sidecar round trip may turn numpy scalars in the header columns into Python ones
+        head = repr([str(v) for v in [self.sheet_name, tag_title, total] + self.field_desc + list(self.bit_positions) + list(self.sizes)])
+        chunks = []
+        for start in range(0, len(self.tag_names), chunk_size):
+            h = hashlib.blake2b(head.encode("utf-8"), digest_size=16)
+            end = start + chunk_size
+            h.update(repr([[str(v) for v in tag] for tag in zip(self.tag_names[start:end], self.fingerprints[start:end],
+                                                                self.crcs[start:end], self.pages_x[start:end],
+                                                                self.pages_y[start:end])]).encode("utf-8"))
+            chunks.append(h.hexdigest())
+        return chunks
+
+    @classmethod
+    def from_frame(cls, sheet_name: str, frame: pd.DataFrame, fingerprints=None) -> "TagSheetModel":
+        """Model of a frame to_frame() produced (e.g. one loaded from a sidecar)."""
+        n = len(frame) - len(RESULT_ROWS)
+        tag_names = [c for c in frame.columns if c not in PREDEFINED_COLUMNS]
+        tags = [frame[name].tolist() for name in tag_names]
+        model = cls(
+            sheet_name,
+            frame["FIELD NAME / DESCRIPTION"].tolist()[:n],
+            frame["BIT POSITION"].tolist()[:n],
+            frame["Size (Bits)"].tolist()[:n],
+            tag_names,
+            [values[:n] for values in tags],
+            [values[n] for values in tags],
+            [values[n + 1] for values in tags],
+            [values[n + 2] for values in tags],
+            list(fingerprints or []),
+        )
+        model._frame = frame
+        return model
+
+
+def extract_tag_columns(columns):
+    tag_cols = []
+    for c in columns:
+        col_str = str(c).strip()
+        if re.match(r"^\d+/[MD]$", col_str):
+            tag_cols.append(c)
+        else:
+            print(f"Column '{col_str}' does not match regex r'^\\d+/[MD]$'")
+    return tag_cols
+
+
+def _first_positions(labels):
+    """label -> position of its first occurrence (what df.at reads), and the repeated labels."""
+    first, repeated = {}, set()
+    for pos, label in enumerate(labels):
+        if label in first:
+            repeated.add(label)
+        else:
+            first[label] = pos
+    return first, repeated
+
+
+def _first(value):
+    return value.iloc[0] if isinstance(value, pd.Series) else value
+
+
+def _cell_int(value, unknown_as_zero):
+    if unknown_as_zero and not (value != 'UNKNOWN'):
+        return 0
+    return int(value)
+
+
+def _conversion_error(df, label, col, unknown_as_zero):
+    """The exception converting df.at[label, col] raises, for the error log."""
+    try:
+        _cell_int(df.at[label, col], unknown_as_zero)
+    except Exception as e:
+        return e
+
+
+def _column_blocks(df, col_pos):
+    """
+    The tag columns as 2-D arrays, one per dtype: [(kind, tag indices, array[rows, tags])] where
+    kind is 'i' (integer / bool), 'f' (float) or 'O' (anything else, as objects).
+    """
+    groups = {}
+    for t, dtype in enumerate(df.dtypes.iloc[col_pos].tolist()):
+        groups.setdefault(dtype if isinstance(dtype, np.dtype) and dtype.kind in 'biuf' else 'O', []).append(t)
+    blocks = []
+    for dtype, tags in groups.items():
+        kind = 'O' if dtype == 'O' else 'f' if dtype.kind == 'f' else 'i'
+        block = df.iloc[:, [col_pos[t] for t in tags]].to_numpy(dtype=object if kind == 'O' else dtype)
+        blocks.append((kind, np.array(tags), block))
+    return blocks
+
+
+def _column_fingerprints(blocks, tag_cols):
+    """Digest of each tag column's name, dtype and cells (with their Python types)."""
+    fingerprints = [None] * len(tag_cols)
+    for kind, tags, block in blocks:
+        for t, cells in zip(tags.tolist(), block.T):
+            h = hashlib.blake2b(str(tag_cols[t]).encode("utf-8"), digest_size=16)
+            if kind == 'O':
+                h.update(repr([(type(v).__name__, v) for v in cells]).encode("utf-8"))
+            else:
+                h.update(cells.dtype.str.encode("ascii"))
+                h.update(np.ascontiguousarray(cells).tobytes())
+            fingerprints[t] = h.hexdigest()
+    return fingerprints
+
+
+def _reusable_columns(previous, sheet_name, field_desc):
+    """(tag name, fingerprint) -> column of `previous` that can be copied as it is."""
+    # Index.equals, not ==: blank (NaN) labels of a model that crossed a process or a sidecar are other float objects
+    if previous is None or previous.sheet_name != sheet_name or not pd.Index(previous.field_desc).equals(pd.Index(field_desc)):
+        return {}
+    # Columns that failed are rebuilt so their error is logged again
+    return {(name, fp): j for j, (name, fp, crc) in enumerate(zip(previous.tag_names, previous.fingerprints, previous.crcs))
+            if isinstance(crc, str)}
+
+
+def _read_tag_fields(blocks, fields, rows, repeated_rows, repeated_cols):
+    """
+    Converts each mapped row across all tag columns at once. Returns {field name: int64 array}
+    and, per tag, the index in `fields` of the first row that failed to convert (-1 if none).
+    """
+    n = len(repeated_cols)
+    failed = np.full(n, -1)
+    ints = {}
+    for f, (name, label, default, unknown_as_zero, width) in enumerate(fields):
+        if label not in rows:
+            ints[name] = np.full(n, default, dtype=np.int64)
+            continue
+        mask = (1 << width) - 1
+        values = np.zeros(n, dtype=np.int64)
+        ok = ~repeated_cols
+        if label in repeated_rows:
+            ok[:] = False
+        else:
+            for kind, tags, block in blocks:
+                row = block[rows[label]]
+                if kind == 'i':
+                    values[tags] = row.astype(np.int64)
+                elif kind == 'f':
+                    finite = np.isfinite(row)
+                    fits = np.abs(row) < 2.0 ** 63
+                    values[tags[fits]] = row[fits].astype(np.int64)     # truncates like int()
+                    for t, v in zip(tags[finite & ~fits].tolist(), row[finite & ~fits].tolist()):
+                        values[t] = int(v) & mask
+                    ok[tags] &= finite
+                else:
+                    for t, v in zip(tags.tolist(), row.tolist()):
+                        try:
+                            values[t] = _cell_int(v, unknown_as_zero) & mask
+                        except Exception:
+                            ok[t] = False
+        failed[(failed < 0) & ~ok] = f
+        ints[name] = values
+    return ints, failed
+
+
+def build_tag_sheet_model(sheet_name, df, previous: Optional["TagSheetModel"] = None) -> Optional["TagSheetModel"]:
+    """
+    Reads the field rows of one TD input sheet (header=1 frame) and encodes every tag column.
+    None when the sheet has no tag data or its row labels match no tag type.
+
+    Row labels are resolved to positions once per sheet; each mapped row is then converted
+    across all tag columns and the sheet is encoded in one batch. Columns unchanged since
+    `previous` (this sheet's model from the last run) are copied from it instead.
+    """
+    print(f"\nProcessing sheet: {sheet_name}")
+
+    sheet_type = detect_sheet_type(sheet_name, df.iloc[:, 0].dropna()) if df.shape[1] else None
+    if sheet_type is None:
+        print(f"Skipping sheet {sheet_name}: its row labels match no tag type.")
+        return None
+    if sheet_type.name != sheet_name:
+        print(f"Sheet {sheet_name} read as {sheet_type.name} from its row labels.")
+
+    df = df.dropna(how='all').reset_index(drop=True)
+    if df.empty:
+        print(f"Sheet {sheet_name} is empty after dropping NA rows.")
+        return None
+
+    df.columns = [str(col).strip() for col in df.columns]
+    
+    df['original_index'] = df[df.columns[0]]
+    if df['original_index'].duplicated().any():
+        print(f"Duplicate index labels found in {sheet_name}: {df['original_index'][df['original_index'].duplicated()].tolist()}")
+        df['original_index'] = df['original_index'].astype(str) + '_' + df.groupby('original_index').cumcount().astype(str)
+        df['original_index'] = df['original_index'].str.replace('_0$', '', regex=True)
+
+    df.set_index('original_index', inplace=True)
+    df.index = df.index.astype(str).str.strip()
+
+    tag_cols = extract_tag_columns(df.columns)
+    print(f"Tag columns found: {tag_cols}")
+    if not tag_cols:
+        print(f"No valid tag columns in sheet {sheet_name}. Regex used: r'^\\d+/[MD]$'")
+        return None
+
+    field_desc = list(df.index)
+    bit_positions = df.loc[:, "BIT POSITION"] if "BIT POSITION" in df.columns else [""] * len(field_desc)
+    sizes = df.loc[:, "Size (Bits)"] if "Size (Bits)" in df.columns else [""] * len(field_desc)
+
+    rows, repeated_rows = _first_positions(df.index)
+    cols, repeated_cols = _first_positions(df.columns)
+    row_pos = np.array([rows[label] for label in field_desc], dtype=np.intp)
+    col_pos = [cols[col] for col in tag_cols]
+    blocks = _column_blocks(df, col_pos)
+    fingerprints = _column_fingerprints(blocks, tag_cols)
+    reusable = _reusable_columns(previous, sheet_name, field_desc)
+    # A header repeated after strip() makes df.at read all of its columns, so it is never copied
+    reused = [None if col in repeated_cols else reusable.get((str(col), fp)) for col, fp in zip(tag_cols, fingerprints)]
+    todo = np.array([j is None for j in reused], dtype=bool)
+    blocks = [(kind, tags[todo[tags]], block[:, todo[tags]]) for kind, tags, block in blocks if todo[tags].any()]
+
+    field_values = [None] * len(tag_cols)
+    for kind, tags, block in blocks:
+        for t, values in zip(tags.tolist(), block[row_pos].T):
+            field_values[t] = list(values)
+    for t, col in enumerate(tag_cols):
+        if col in repeated_cols:
+            field_values[t] = [_first(df.at[row, col]) for row in field_desc]
+
+    crcs, pages_x, pages_y = [0] * len(tag_cols), [BLANK_PAGE] * len(tag_cols), [BLANK_PAGE] * len(tag_cols)
+    fields = sheet_type.fields
+    repeated = np.array([col in repeated_cols for col in tag_cols], dtype=bool)
+    ints, failed = _read_tag_fields(blocks, fields, rows, repeated_rows, repeated)
+    failed[~todo] = -1
+    layout = sheet_type.layout
+    good = np.flatnonzero((failed < 0) & todo)
+    if len(good):
+        px, py, crc = encode_layout_batch(get_plan(layout), {name: ints[name][good] for name in layout.field_names})
+        for i, c, x, y in zip(good.tolist(), format_crcs(crc), format_pages(px, layout.trim_zeros),
+                              format_pages(py, layout.trim_zeros)):
+            crcs[i], pages_x[i], pages_y[i] = c, x, y
+
+    n = len(field_desc)
+    tag_data = {}
+    for i, col in enumerate(tag_cols):
+        j = reused[i]
+        if j is not None:
+            tag_data[str(col)] = (previous.field_values[j], previous.crcs[j], previous.pages_x[j], previous.pages_y[j])
+        elif failed[i] >= 0:
+            name, label, default, unknown_as_zero, width = fields[failed[i]]
+            print(f"Error processing column {col} in sheet {sheet_name}: {_conversion_error(df, label, col, unknown_as_zero)}")
+            tag_data[str(col)] = ([""] * n, 0, BLANK_PAGE, BLANK_PAGE)
+        else:
+            tag_data[str(col)] = (field_values[i], crcs[i], pages_x[i], pages_y[i])
+
+    # A repeated tag name keeps its first position and its last column's values, as before
+    digests = dict(zip(map(str, tag_cols), fingerprints))
+    results = list(tag_data.values())
+    return TagSheetModel(
+        sheet_name, field_desc, list(bit_positions), list(sizes), list(tag_data),
+        [r[0] for r in results], [r[1] for r in results], [r[2] for r in results], [r[3] for r in results],
+        [digests[name] for name in tag_data], reused_columns=sum(j is not None for j in reused),
+    )
+
+
+def process_input_sheet(sheet_name, df):
+    """The formatted sheet frame of one TD input sheet, or None when it has no tag data."""
+    model = build_tag_sheet_model(sheet_name, df)
+    return None if model is None else model.to_frame()
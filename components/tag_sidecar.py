@@ -0,0 +1,227 @@
+"""
+On-disk columnar sidecar of a parsed TD workbook: the TagSheetModel frames and footer ranges,
+written next to the source as <name>.xlsx.tdcols.
+
+After a restart the parse cache maps the sidecar instead of re-reading the xlsx. The header
+records the source's size and SHA-256 (plus the format and pandas versions), so a sidecar whose
+source has changed is ignored and rewritten on the next parse (though it is still read, with
+any_source=True, as the previous run to diff the new version against). It also records the
+encoder's codec_fingerprint; a sidecar written by another encoder is never read, as its pages
+and CRCs would be stale. TD_SIDECAR=0 turns sidecars off.
+
+Layout: MAGIC, header length (uint64 LE), JSON header, then 64-byte aligned arrays. Numeric
+columns are stored as-is; object columns as a kind code per cell plus int / float values and a
+UTF-8 string table, so every cell comes back with the type it was built with.
+"""
+import json
+import mmap
+import os
+import struct
+from numbers import Integral
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from calculations.batch import codec_fingerprint
+
+MAGIC = b"TDCOLS01"
+FORMAT_VERSION = 3          # 3: sheets are no longer kept when their row labels match no tag type
+SUFFIX = ".tdcols"
+ALIGN = 64
+SIDECARS_ENABLED = os.environ.get("TD_SIDECAR", "1") != "0"
+
+KIND_NONE, KIND_INT, KIND_FLOAT, KIND_STR, KIND_BOOL, KIND_NP_INT, KIND_NP_FLOAT = range(7)
+
+
+class UnsupportedFrame(ValueError):
+    pass
+
+
+def sidecar_path(source_path: str) -> str:
+    return source_path + SUFFIX
+
+
+def _mixed_arrays(values) -> dict:
+    n = len(values)
+    kinds = np.zeros(n, dtype=np.uint8)
+    ints = np.zeros(n, dtype=np.int64)
+    floats = np.zeros(n, dtype=np.float64)
+    strings = []
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    pos = 0
+    for i, v in enumerate(values):
+        if v is None:
+            pass
+        elif isinstance(v, (bool, np.bool_)):
+            kinds[i] = KIND_BOOL
+            ints[i] = int(v)
+        elif isinstance(v, Integral):
+            kinds[i] = KIND_NP_INT if isinstance(v, np.integer) else KIND_INT
+            ints[i] = int(v)
+        elif isinstance(v, (float, np.floating)):
+            kinds[i] = KIND_NP_FLOAT if isinstance(v, np.floating) else KIND_FLOAT
+            floats[i] = v
+        elif isinstance(v, str):
+            kinds[i] = KIND_STR
+            strings.append(v)
+            pos += len(v)
+        else:
+            raise UnsupportedFrame(f"cannot store {type(v).__name__} cell")
+        offsets[i + 1] = pos
+
+    arrays = {"kinds": kinds}
+    if np.isin(kinds, (KIND_INT, KIND_BOOL, KIND_NP_INT)).any():
+        arrays["ints"] = ints
+    if np.isin(kinds, (KIND_FLOAT, KIND_NP_FLOAT)).any():
+        arrays["floats"] = floats
+    if strings:
+        arrays["offsets"] = offsets
+        arrays["text"] = np.frombuffer("".join(strings).encode("utf-8"), dtype=np.uint8)
+    return arrays
+
+
+def _mixed_values(arrays: dict, n: int) -> np.ndarray:
+    kinds = arrays["kinds"]
+    values = np.full(n, None, dtype=object)
+    for kind, source, convert in ((KIND_INT, "ints", None), (KIND_BOOL, "ints", bool), (KIND_FLOAT, "floats", None),
+                                  (KIND_NP_INT, "ints", np.int64), (KIND_NP_FLOAT, "floats", np.float64)):
+        idx = np.flatnonzero(kinds == kind)
+        if len(idx):
+            cells = arrays[source][idx].tolist()
+            values[idx] = [convert(c) for c in cells] if convert else cells
+    idx = np.flatnonzero(kinds == KIND_STR)
+    if len(idx):
+        text = arrays["text"].tobytes().decode("utf-8")
+        offsets = arrays["offsets"]
+        values[idx] = [text[offsets[i]:offsets[i + 1]] for i in idx.tolist()]
+    return values
+
+
+def _frame_columns(df: pd.DataFrame) -> Tuple[list, list]:
+    if not isinstance(df.index, pd.RangeIndex) or df.index.start != 0 or df.index.step != 1:
+        raise UnsupportedFrame("frame index is not a default RangeIndex")
+    if df.columns.duplicated().any():
+        raise UnsupportedFrame("duplicate column names")
+
+    columns, arrays = [], []
+    for name in df.columns:
+        series = df[name]
+        if isinstance(series.dtype, np.dtype) and series.dtype.kind in "biuf":
+            column_arrays = {"values": series.to_numpy()}
+            storage = "native"
+        else:
+            column_arrays = _mixed_arrays(series.tolist())
+            storage = "mixed"
+        columns.append({"name": str(name), "dtype": str(series.dtype), "storage": storage})
+        arrays.append(column_arrays)
+    return columns, arrays
+
+
+def write_sidecar(source_path: str, size: int, sha256: str, processed: List[tuple], ranges: tuple) -> Optional[str]:
+    """
+    Writes (sheet_name, tag_title, frame or None, column fingerprints) sheets atomically. Returns
+    the sidecar's path, or None when the frames cannot be stored or the directory is not writable.
+    """
+    header = {
+        "version": FORMAT_VERSION,
+        "pandas": pd.__version__,
+        "codec": codec_fingerprint(),
+        "source": {"size": size, "sha256": sha256},
+        "ranges": list(ranges),
+        "sheets": [],
+    }
+    blobs = []
+    offset = 0
+    try:
+        for sheet_name, tag_title, df, fingerprints in processed:
+            sheet = {"name": sheet_name, "title": tag_title, "frame": None, "fingerprints": list(fingerprints)}
+            if df is not None:
+                columns, column_arrays = _frame_columns(df)
+                for column, arrays in zip(columns, column_arrays):
+                    layout = {}
+                    for key, arr in arrays.items():
+                        arr = np.ascontiguousarray(arr)
+                        layout[key] = [offset, arr.dtype.str, len(arr)]
+                        blobs.append((offset, arr))
+                        offset += -(-arr.nbytes // ALIGN) * ALIGN
+                    column["arrays"] = layout
+                sheet["frame"] = {"rows": len(df), "columns": columns}
+            header["sheets"].append(sheet)
+    except UnsupportedFrame as e:
+        print(f"Sidecar not written for {source_path}: {e}")
+        return None
+
+    header_bytes = json.dumps(header).encode("utf-8")
+    data_start = -(-(len(MAGIC) + 8 + len(header_bytes)) // ALIGN) * ALIGN
+    path = sidecar_path(source_path)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(MAGIC + struct.pack("<Q", len(header_bytes)) + header_bytes)
+            for blob_offset, arr in blobs:
+                f.seek(data_start + blob_offset)
+                f.write(arr.tobytes())
+            f.truncate(data_start + offset)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Sidecar not written for {source_path}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return None
+    return path
+
+
+def load_sidecar(source_path: str, size: int = None, sha256: str = None, any_source: bool = False):
+    """
+    (processed sheets, ranges) from the sidecar of `source_path`, or None when there is no
+    sidecar, it was written by a different encoder, or for a different version of the source
+    (unless `any_source`).
+    """
+    path = sidecar_path(source_path)
+    try:
+        f = open(path, "rb")
+    except OSError:
+        return None
+    with f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:          # empty file
+            return None
+        try:
+            if mm[:len(MAGIC)] != MAGIC:
+                return None
+            (header_len,) = struct.unpack_from("<Q", mm, len(MAGIC))
+            header_end = len(MAGIC) + 8 + header_len
+            header = json.loads(mm[len(MAGIC) + 8:header_end].decode("utf-8"))
+            if (header.get("version") != FORMAT_VERSION or header.get("pandas") != pd.__version__
+                    or header.get("codec") != codec_fingerprint()
+                    or not any_source and header["source"] != {"size": size, "sha256": sha256}):
+                return None
+            data_start = -(-header_end // ALIGN) * ALIGN
+
+            processed = []
+            for sheet in header["sheets"]:
+                frame = sheet["frame"]
+                df = None
+                if frame is not None:
+                    n = frame["rows"]
+                    data = {}
+                    for column in frame["columns"]:
+                        # Copied out of the mapping so the file is not held open (Windows locks it)
+                        arrays = {key: np.frombuffer(mm, dtype=np.dtype(dt), count=count, offset=data_start + off).copy()
+                                  for key, (off, dt, count) in column["arrays"].items()}
+                        if column["storage"] == "native":
+                            data[column["name"]] = arrays["values"]
+                        else:
+                            values = _mixed_values(arrays, n)
+                            data[column["name"]] = (values if column["dtype"] == "object"
+                                                    else pd.Series(values, dtype=object).astype(column["dtype"]))
+                    df = pd.DataFrame(data, index=pd.RangeIndex(n), columns=[c["name"] for c in frame["columns"]])
+                processed.append((sheet["name"], sheet["title"], df, sheet["fingerprints"]))
+            return processed, tuple(header["ranges"])
+        except (ValueError, KeyError, TypeError, IndexError, struct.error) as e:
+            print(f"Ignoring unreadable sidecar {path}: {e}")
+            return None
+        finally:
+            mm.close()
@@ -0,0 +1,190 @@
+"""
+Single-pass TD workbook ingest.
+
+pd.read_excel(header=1) followed by pd.read_excel(header=None) parses every sheet's XML twice just
+to get the title cell. Here each sheet is streamed once from a read-only openpyxl workbook; the
+converted rows give the title and the same frame pd.read_excel(path, header=1) returns, built
+with pandas' own TextParser.
+
+The reader backend is chosen with TD_READER_BACKEND: "stream" (default) reads one sheet at a
+time from the row stream, "pandas" is the previous pd.read_excel path that loads every sheet
+up front.
+"""
+import os
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+from openpyxl.cell.cell import TYPE_ERROR, TYPE_NUMERIC
+from pandas.errors import EmptyDataError
+from pandas.io.parsers import TextParser
+
+DEFAULT_TITLE = "TAG"
+READER_BACKENDS = ("stream", "pandas")
+READER_BACKEND = os.environ.get("TD_READER_BACKEND", "stream")
+
+
+def get_reader_backend(value: str = None) -> str:
+    backend = (value or READER_BACKEND).lower()
+    if backend not in READER_BACKENDS:
+        raise ValueError(f"Unknown reader backend {backend!r}, expected one of {READER_BACKENDS}")
+    return backend
+
+
+@dataclass
+class TDSheet:
+    name: str
+    title: str
+    df: pd.DataFrame        # as pd.read_excel(path, sheet_name=name, header=1)
+
+
+def _convert_cell(cell):
+    # Same conversion as pandas' openpyxl reader
+    if cell.value is None:
+        return ""
+    if cell.data_type == TYPE_ERROR:
+        return np.nan
+    if cell.data_type == TYPE_NUMERIC:
+        value = int(cell.value)
+        if value == cell.value:
+            return value
+        return float(cell.value)
+    return cell.value
+
+
+def iter_rows(ws) -> Iterator[list]:
+    """
+    Streams the converted rows of a worksheet with trailing empty cells trimmed. Trailing empty
+    rows are dropped; rows are not padded to equal width.
+    """
+    if getattr(ws, "reset_dimensions", None):
+        ws.reset_dimensions()
+    empty_rows = 0
+    for row in ws.iter_rows():
+        values = [_convert_cell(cell) for cell in row]
+        while values and values[-1] == "":
+            values.pop()
+        if not values:
+            empty_rows += 1
+            continue
+        for _ in range(empty_rows):
+            yield []
+        empty_rows = 0
+        yield values
+
+
+def sheet_rows(ws) -> List[list]:
+    """
+    Converted cell values of a worksheet, trailing empty cells / rows trimmed and rows padded
+    to equal width, exactly as pandas reads them.
+    """
+    return pad_rows(list(iter_rows(ws)))
+
+
+def pad_rows(rows: List[list]) -> List[list]:
+    """Rows padded with "" to equal width, as pandas reads them."""
+    if rows:
+        width = max(len(r) for r in rows)
+        if min(len(r) for r in rows) < width:
+            rows = [r + [""] * (width - len(r)) for r in rows]
+    return rows
+
+
+def rows_to_frame(rows: List[list], header: Optional[int] = 1) -> pd.DataFrame:
+    """The frame pd.read_excel(header=header) builds from `rows`."""
+    try:
+        return TextParser(rows, header=header, skip_blank_lines=False).read()
+    except EmptyDataError:
+        return pd.DataFrame()
+
+
+def sheet_title(rows: List[list]) -> str:
+    """
+    Cell A1 as the generators have always read it: str(raw_df.iloc[0, 0]) of the header=None frame,
+    which is "nan" for an empty A1 and "TAG" for an empty sheet.
+    """
+    if not rows:
+        return DEFAULT_TITLE
+    value = rows[0][0]
+    return "nan" if value == "" else str(value)
+
+
+def workbook_sheet_names(path: str) -> List[str]:
+    wb = load_workbook(path, read_only=True, data_only=True, keep_links=False)
+    try:
+        return list(wb.sheetnames)
+    finally:
+        wb.close()
+
+
+def parse_sheet_selection(values, path: str) -> Optional[List[str]]:
+    """
+    Sheet names from a request's `sheets` values (repeated fields and / or comma separated), or
+    None for every sheet. Raises ValueError for names the workbook at `path` does not have.
+    """
+    names = [name.strip() for value in values or [] for name in str(value).split(",") if name.strip()]
+    if not names:
+        return None
+    available = workbook_sheet_names(path)
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        raise ValueError(f"Unknown sheets {unknown}; the workbook has {available}")
+    return names
+
+
+def stream_workbook(path: str, sheet_names: Sequence[str] = None) -> Iterator[Tuple[str, Iterator[list]]]:
+    """
+    (sheet name, row iterator) for each requested sheet (all by default) in workbook order.
+    Only one row is held at a time; each iterator must be consumed before moving to the next sheet.
+    """
+    wb = load_workbook(path, read_only=True, data_only=True, keep_links=False)
+    try:
+        wanted = None if sheet_names is None else set(sheet_names)
+        for name in wb.sheetnames:
+            if wanted is None or name in wanted:
+                yield name, iter_rows(wb[name])
+    finally:
+        wb.close()
+
+
+def iter_sheet_rows(path: str, sheet_names: Sequence[str] = None) -> Iterator[Tuple[str, List[list]]]:
+    """
+    (sheet name, rows) for each requested sheet, rows padded as pandas reads them.
+    """
+    for name, rows in stream_workbook(path, sheet_names):
+        yield name, pad_rows(list(rows))
+
+
+def _iter_td_sheets_pandas(path: str, sheet_names: Sequence[str] = None) -> Iterator[TDSheet]:
+    names = None if sheet_names is None else list(sheet_names)
+    all_sheets = pd.read_excel(path, sheet_name=names, header=1)
+    all_raw = pd.read_excel(path, sheet_name=names, header=None)
+    for name, df in all_sheets.items():
+        raw_df = all_raw[name]
+        yield TDSheet(name, str(raw_df.iloc[0, 0]) if not raw_df.empty else DEFAULT_TITLE, df)
+
+
+def iter_td_sheets(path: str, sheet_names: Sequence[str] = None, backend: str = None) -> Iterator[TDSheet]:
+    if get_reader_backend(backend) == "pandas":
+        yield from _iter_td_sheets_pandas(path, sheet_names)
+        return
+    for name, rows in iter_sheet_rows(path, sheet_names):
+        yield td_sheet_from_rows(name, rows)
+
+
+def td_sheet_from_rows(name: str, rows: List[list]) -> TDSheet:
+    """TDSheet from one sheet's streamed rows (padded or not)."""
+    rows = pad_rows(rows)
+    return TDSheet(name, sheet_title(rows), rows_to_frame(rows, header=1))
+
+
+def read_td_workbook(path: str, sheet_names: Sequence[str] = None, backend: str = None) -> Dict[str, TDSheet]:
+    """Sheet name -> TDSheet(title, header-1 frame), from one parse of the workbook."""
+    return {sheet.name: sheet for sheet in iter_td_sheets(path, sheet_names, backend)}
+
+
+def read_raw_workbook(path: str, sheet_names: Sequence[str] = None) -> Dict[str, pd.DataFrame]:
+    """Sheet name -> frame as pd.read_excel(header=None)."""
+    return {name: rows_to_frame(rows, header=None) for name, rows in iter_sheet_rows(path, sheet_names)}
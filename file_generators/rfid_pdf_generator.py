@@ -4,7 +4,8 @@ from reportlab.lib.utils import ImageReader
 from reportlab.platypus import Paragraph, Frame
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.enums import TA_LEFT, TA_CENTER, TA_RIGHT
-from components.bottom_left_tables import draw_title_block_on_pdf, draw_bottom_right_block_on_pdf, draw_direction_arrows, draw_combined_station_and_border_table, extract_tag_and_tin_ranges
+from components.bottom_left_tables import draw_title_block_on_pdf, draw_bottom_right_block_on_pdf, draw_direction_arrows, draw_combined_station_and_border_table
+from components.parse_cache import PARSE_CACHE
 from PIL import Image
 import os
 
@@ -138,7 +139,7 @@ def generate_pdf_with_rfid_image():
         # Draw image first (above title block)
         c.drawImage(ImageReader(image_path), content_rect['x0'], image_y, width=img_width, height=img_height)
 
-        alloted_tags, alloted_tins, station_ids, most_station_id, border_tags = extract_tag_and_tin_ranges(tag_data_path)
+        alloted_tags, alloted_tins, station_ids, most_station_id, border_tags = PARSE_CACHE.tag_and_tin_ranges(tag_data_path)
         
         # Draw title block at bottom
         draw_title_block_on_pdf(
@@ -0,0 +1,163 @@
+from flask import request, jsonify
+import json
+import os
+import threading
+from calculations.batch import codec_fingerprint
+from components.parallel_jobs import get_worker_count, run_jobs
+from components.parse_cache import PARSE_CACHE
+from components.tag_data_footer import footer_template_version
+from file_generators import tag_data_pdf_generator
+from file_generators.tag_data_excel_formatted_generator import write_formatted_workbook
+from file_generators.tag_data_pdf_generator import write_td_pdf
+
+FORMATS = ("xlsx", "pdf")
+FORMAT_LABELS = {"xlsx": "Excel", "pdf": "PDF"}
+MANIFEST_VERSION = 1
+RENDER_VERSION = 1          # bump when the Excel / PDF rendering changes, so kept outputs are redrawn
+
+
+def _output_name(input_filename, fmt):
+    return f"{input_filename}_formatted.xlsx" if fmt == "xlsx" else "37111_MWH_TD_ver2_0_0.pdf"
+
+
+def _manifest_path(output_dir, input_filename):
+    return os.path.join(output_dir, f".{input_filename}.tdrun.json")
+
+
+def _load_manifest(path):
+    try:
+        with open(path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return manifest if manifest.get("version") == MANIFEST_VERSION else {}
+
+
+def _chunks_changed(sheets, previous_sheets):
+    """Rendered chunks (10 tag columns each) that differ from the previous run's."""
+    before = {name: chunks for name, _, chunks in previous_sheets or []}
+    return sum(1 for name, _, chunks in sheets for i, chunk in enumerate(chunks)
+               if i >= len(before.get(name, [])) or before[name][i] != chunk)
+
+
+def _file_stamp(path):
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def _write_output(writer, sheets, output_file, label):
+    """
+    Runs `writer` into a temporary file next to `output_file` and moves it into place, so the
+    last good output survives a run that renders nothing (or fails).
+    """
+    tmp_file = os.path.join(os.path.dirname(output_file),
+                            f".{os.path.basename(output_file)}.{os.getpid()}-{threading.get_ident()}.tmp")
+    try:
+        written = writer(sheets, tmp_file)
+        if written:
+            os.replace(tmp_file, output_file)
+            print(f"✅ Final {label} saved: {output_file}")
+        return written
+    finally:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+
+
+def generate_station_outputs(input_path, output_dir, formats, workers=0):
+    """
+    One station's TD outputs, written to `output_dir` with the same names as /api/convert-file and
+    /api/generate-pdf, from a single parse / encode of the workbook. In a pool worker (batch
+    jobs) sheets are processed serially.
+
+    Returns (outputs, reuse). Only tag columns changed since the last run are re-encoded, and an
+    output whose rendered chunks are all unchanged (and whose file is as we left it) is kept
+    instead of rendered again; `reuse` reports both.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    input_filename = os.path.splitext(os.path.basename(input_path))[0]
+    sheets, reuse = PARSE_CACHE.sheet_models_with_reuse(input_path, workers)
+
+    manifest_path = _manifest_path(output_dir, input_filename)
+    previous = _load_manifest(manifest_path)
+    chunks = [[name, title, [] if model is None else model.chunk_fingerprints(title)] for name, title, model in sheets]
+    # Both footers come from files/template.xlsx; the PDF's also carries the date the server started
+    template = dict(zip(("mtime_ns", "size"), footer_template_version()))
+    code = {"render": RENDER_VERSION, "codec": codec_fingerprint()}
+    render_inputs = {"xlsx": {"template": template, **code},
+                     "pdf": {"template": template, "date": tag_data_pdf_generator.current_date, **code}}
+    reuse.update(chunks=sum(len(c) for _, _, c in chunks), chunks_changed=_chunks_changed(chunks, previous.get("sheets")),
+                 outputs_reused=[])
+
+    outputs = {}
+    rendered = {}
+    writers = {"xlsx": write_formatted_workbook, "pdf": write_td_pdf}
+    for fmt in FORMATS:
+        if fmt not in formats:
+            continue
+        output_file = os.path.join(output_dir, _output_name(input_filename, fmt))
+        last = previous.get("outputs", {}).get(fmt)
+        if (last and previous.get("sheets") == chunks and last["inputs"] == render_inputs[fmt]
+                and os.path.isfile(output_file) and _file_stamp(output_file) == last["stamp"]):
+            outputs[fmt] = output_file
+            rendered[fmt] = last
+            reuse["outputs_reused"].append(fmt)
+            continue
+
+        if _write_output(writers[fmt], sheets, output_file, FORMAT_LABELS[fmt]):
+            outputs[fmt] = output_file
+            rendered[fmt] = {"inputs": render_inputs[fmt], "stamp": _file_stamp(output_file)}
+
+    for fmt, last in previous.get("outputs", {}).items():
+        if fmt not in formats and previous.get("sheets") == chunks:
+            rendered.setdefault(fmt, last)
+    try:
+        with open(manifest_path, "w") as f:
+            json.dump({"version": MANIFEST_VERSION, "sheets": chunks, "outputs": rendered}, f)
+    except OSError as e:
+        print(f"Run manifest not written for {input_path}: {e}")
+
+    return outputs, reuse
+
+
+def generate_batch():
+    """
+    JSON body: input_paths (TD workbooks, one per station), output_path, optional formats
+    (default both) and workers. Each station's files go to output_path/<input file name>/.
+    """
+    data = request.json or {}
+    input_paths = data.get('input_paths', [])
+    output_path = data.get('output_path')
+    formats = [f for f in data.get('formats', FORMATS) if f in FORMATS]
+
+    if not input_paths or not output_path:
+        return jsonify({'error': 'input_paths and output_path are required'}), 400
+
+    if not formats:
+        return jsonify({'error': f'formats must contain at least one of {list(FORMATS)}'}), 400
+
+    invalid = [p for p in input_paths if not p.endswith('.xlsx') or not os.path.isfile(p)]
+    if invalid:
+        return jsonify({'error': 'Invalid or missing input files', 'files': invalid}), 400
+
+    try:
+        os.makedirs(output_path, exist_ok=True)
+        jobs = [
+            (p, os.path.join(output_path, os.path.splitext(os.path.basename(p))[0]), formats)
+            for p in input_paths
+        ]
+        results = run_jobs(generate_station_outputs, jobs, get_worker_count(data.get('workers')))
+
+        stations = []
+        for job in results:
+            entry = {"input_path": job["args"][0]}
+            if "error" in job:
+                entry["error"] = job["error"]
+            else:
+                entry["outputs"], entry["reuse"] = job["result"]
+            stations.append(entry)
+
+        failed = sum(1 for s in stations if "error" in s or not s["outputs"])
+        return jsonify({"stations": stations, "failed": failed}), 200 if not failed else 207
+
+    except Exception as e:
+        return jsonify({'error': f'Batch generation failed: {str(e)}'}), 500
@@ -0,0 +1,56 @@
+from flask import request, send_file, jsonify
+import json
+import os
+import zipfile
+from components.parallel_jobs import get_worker_count
+from file_generators.tag_data_batch_generator import FORMATS, generate_station_outputs
+
+
+def generate_td_documents():
+    """
+    Formatted TD workbook and TD PDF for one input, from one parse / encode pass. Both files are
+    written to output_path (same names as /api/convert-file and /api/generate-pdf) and returned
+    together as <input>_documents.zip. The X-TD-Reuse header reports how much of the previous
+    run's work was reused (see generate_station_outputs).
+    """
+    try:
+        if 'input_path' not in request.form or 'output_path' not in request.form:
+            return jsonify({"error": "Missing input or output path"}), 400
+
+        input_path = request.form['input_path']
+        output_path = request.form['output_path']
+
+        if not input_path.endswith('.xlsx'):
+            return jsonify({"error": "Invalid input file format. Please provide an .xlsx file path"}), 400
+
+        if not os.path.isfile(input_path):
+            return jsonify({"error": "Input file does not exist"}), 400
+
+        if not os.path.isdir(os.path.dirname(output_path)):
+            return jsonify({"error": "Invalid output directory"}), 400
+
+        drive = os.path.splitdrive(output_path)[0]
+        if drive and not os.path.exists(drive):
+            return jsonify({"error": f"Drive {drive} does not exist or is not accessible"}), 400
+
+        outputs, reuse = generate_station_outputs(input_path, output_path, FORMATS, get_worker_count(request.form.get('workers')))
+        if not outputs:
+            return jsonify({"error": "No sheets processed. Output files not saved."}), 400
+
+        input_filename = os.path.splitext(os.path.basename(input_path))[0]
+        archive = os.path.join(output_path, f"{input_filename}_documents.zip")
+        with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as zf:
+            for output_file in outputs.values():
+                zf.write(output_file, os.path.basename(output_file))
+
+        response = send_file(
+            archive,
+            as_attachment=True,
+            download_name=os.path.basename(archive),
+            mimetype="application/zip"
+        )
+        response.headers["X-TD-Reuse"] = json.dumps(reuse)
+        return response
+
+    except Exception as e:
+        return jsonify({"error": f"Processing failed: {str(e)}"}), 500
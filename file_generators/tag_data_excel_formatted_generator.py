@@ -1,26 +1,33 @@
 from flask import Flask, request, send_file, jsonify
 import pandas as pd
-import re
 import os
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.utils.dataframe import dataframe_to_rows
 from openpyxl.utils import get_column_letter
 from openpyxl.styles import Font, Alignment, Border, Side, PatternFill
-from calculations.calculations_nt import generate_pages_for_tag as calculate_values_nt, TagInfo as TagInfoNT, TagDir as TagDirNT
-from calculations.calculations_aline import calculate_values as calculate_values_aline, TagInfo as TagInfoAline, TagDir as TagDirAline
-from calculations.calculations_adj import generate_pages_for_tag as calculate_values_adj, TagInfo as TagInfoAdj, TagDir as TagDirAdj
+from calculations.tag_batch import TagBatch
+from components.parallel_jobs import get_worker_count
+from components.parse_cache import PARSE_CACHE
+from components.workbook_ingest import parse_sheet_selection
+from components.tag_sheet_model import TagSheetModel, process_input_sheet
+from components.excel_styles import StyleRegistry
+from components.tag_sheet_layout import (CHUNK_SIZE, LABEL_COLUMNS, TITLE_COLUMNS, TITLE_HEIGHT, add_merged_range,
+                                         iter_chunk_layouts, sheet_layout, table_columns, tag_column_names)
 
 app = Flask(__name__)
 
-def extract_tag_columns(columns):
-    tag_cols = []
-    for c in columns:
-        col_str = str(c).strip()
-        if re.match(r"^\d+/[MD]$", col_str):
-            tag_cols.append(c)
-        else:
-            print(f"Column '{col_str}' does not match regex r'^\\d+/[MD]$'")
-    return tag_cols
+# "memory" builds each sheet in a regular openpyxl Workbook; "stream" writes rows as they are laid
+# out to a write-only Workbook, so memory stays flat however many tags a sheet has
+EXCEL_WRITERS = ("memory", "stream")
+EXCEL_WRITER = os.environ.get("TD_EXCEL_WRITER", "memory")
+
+
+def get_excel_writer(value=None):
+    writer = (value or EXCEL_WRITER).lower()
+    if writer not in EXCEL_WRITERS:
+        raise ValueError(f"Unknown Excel writer {writer!r}, expected one of {EXCEL_WRITERS}")
+    return writer
 
 def get_style_elements():
     thin = Side(border_style="thin", color="000000")
@@ -31,46 +38,67 @@ def get_style_elements():
     align = Alignment(horizontal="center", vertical="center", wrap_text=True, indent=1)
     return border, fill, font, bold_font, align
 
-def format_sheet(ws, df, tag_title):
-    from math import ceil
-
+def register_td_styles(styles):
+    """Names of the field table's styles in the workbook of `styles` (a StyleRegistry)."""
     border, fill, font, bold_font, align = get_style_elements()
+    return {
+        "title": styles.style("TD title", Font(name='Times New Roman', size=14, bold=True), border=border,
+                              alignment=Alignment(horizontal='center', vertical='center')),
+        "field header": styles.style("TD header", bold_font, fill, border, align),
+        # Tag headers and field cells look the same
+        "bold": styles.style("TD bold", bold_font, border=border, alignment=align),
+        "tag value": styles.style("TD value", font, border=border, alignment=align),
+        "merged": styles.style("TD merged", border=border),
+    }
+
+def cell_style(names, is_header, is_predefined):
+    if is_header and is_predefined:
+        return names["field header"]
+    return names["bold"] if (is_header or is_predefined) else names["tag value"]
+
+def get_footer_values(page, total_pages):
+    return {
+        "division": {"value": "PRAYAGRAJ Division", "size": 22},
+        "railways": {"value": "NC RAILWAYS", "size": 22},
+        "station-name": {"value": "MALWAN(MWH)", "size": 22},
+        "station-id": {"value": "Section Id: 37111", "size": 22},
+        "date": {"value": "25-07-2025", "size": 22},
+        "total-pages": {"value": str(total_pages), "size": 22},
+        "current-page": {"value": str(page), "size": 22}
+    }
+
+def format_sheet(ws, df, tag_title, styles=None):
+    if isinstance(df, (TagBatch, TagSheetModel)):
+        df = df.to_frame()
+
+    styles = styles or StyleRegistry.of(ws.parent)
+    names = register_td_styles(styles)
     predefined_cols = ["FIELD NAME / DESCRIPTION", "BIT POSITION", "Size (Bits)"]
     tag_columns = [col for col in df.columns if col not in predefined_cols]
-    chunk_size = 10
-    total_chunks = ceil(len(tag_columns) / chunk_size)
+    total_chunks = -(-len(tag_columns) // CHUNK_SIZE)
     current_row = 1
+    # Widths and heights come from the values, not from reading the written cells back
+    layout = sheet_layout(df)
+    for col_letter, width in layout.column_widths.items():
+        ws.column_dimensions[col_letter].width = width
 
     try:
-        from components.tag_data_footer import extract_template_with_placeholders, insert_footer_into_worksheet
-        base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
-        files_dir = os.path.join(base_dir, "files")
-        template_path = os.path.join(files_dir, "template.xlsx")
-        footer_template = extract_template_with_placeholders(template_path, "A2:O6")
+        from components.tag_data_footer import insert_footer_into_worksheet, load_footer_template
+        footer_template = load_footer_template()
     except ImportError:
         footer_template = {"template": []}
         print("Warning: Footer module not found. Footer insertion will be skipped.")
 
     for i in range(total_chunks):
-        footer_values = {
-            "division": {"value": "PRAYAGRAJ Division", "size": 22},
-            "railways": {"value": "NC RAILWAYS", "size": 22},
-            "station-name": {"value": "MALWAN(MWH)", "size": 22},
-            "station-id": {"value": "Section Id: 37111", "size": 22},
-            "date": {"value": "25-07-2025", "size": 22},
-            "total-pages": {"value": str(total_chunks), "size": 22},
-            "current-page": {"value": str(i + 1), "size": 22}
-        }
-        start = i * chunk_size
-        end = start + chunk_size
+        footer_values = get_footer_values(i + 1, total_chunks)
+        start = i * CHUNK_SIZE
+        end = start + CHUNK_SIZE
         tag_chunk = tag_columns[start:end]
         temp_df = df[predefined_cols + tag_chunk]
 
-        ws.merge_cells(start_row=current_row, start_column=1, end_row=current_row, end_column=15)
+        add_merged_range(ws, f"A{current_row}:{get_column_letter(TITLE_COLUMNS)}{current_row}")
         header_cell = ws.cell(row=current_row, column=1, value=tag_title)
-        header_cell.font = Font(name='Times New Roman', size=14, bold=True)
-        header_cell.alignment = Alignment(horizontal='center', vertical='center')
-        header_cell.border = border
+        header_cell.style = names["title"]
         ws.row_dimensions[current_row].height = 25
         current_row += 1
 
@@ -78,319 +106,151 @@ def format_sheet(ws, df, tag_title):
             for c_idx, value in enumerate(row, start=1):
                 actual_col = c_idx + 2 if c_idx > 1 else c_idx
                 if c_idx == 1:
-                    ws.merge_cells(start_row=r_idx, start_column=1, end_row=r_idx, end_column=3)
+                    add_merged_range(ws, f"A{r_idx}:{get_column_letter(LABEL_COLUMNS)}{r_idx}")
                     ws.cell(row=r_idx, column=1, value=value)
-                    for col in range(1, 4):
-                        ws.cell(row=r_idx, column=col).border = border
+                    for col in range(2, 4):
+                        ws.cell(row=r_idx, column=col).style = names["merged"]
                 else:
                     ws.cell(row=r_idx, column=actual_col, value=value)
 
                 cell = ws.cell(row=r_idx, column=actual_col if c_idx > 1 else 1)
                 is_header = r_idx == current_row
                 is_predefined = c_idx <= 3
-                cell.font = bold_font if (is_predefined and not is_header) else (bold_font if is_header else font)
-                cell.alignment = align
-                cell.border = border
-                if is_header and c_idx <= 3:
-                    cell.fill = fill
-
-        for col_letter in ['A', 'B', 'C']:
-            ws.column_dimensions[col_letter].width = 20
-        ws.column_dimensions['D'].width = 35
-        ws.column_dimensions['E'].width = 35
-
-        num_tag_cols = 10
-        min_width = 20
-        for col_offset in range(num_tag_cols):
-            col = 6 + col_offset
-            col_letter = get_column_letter(col)
-            max_length = 0
-            if col_offset < len(temp_df.columns) - 3:
-                for row_offset in range(temp_df.shape[0] + 1):
-                    cell = ws.cell(row=current_row + row_offset, column=col)
-                    if cell.value:
-                        max_length = max(max_length, len(str(cell.value)))
-            width = max(min_width, min(max_length + 4, 40))
-            ws.column_dimensions[col_letter].width = width
-
-        for row_offset in range(temp_df.shape[0] + 1):
-            r = current_row + row_offset
-            max_lines = 1
-            for col in range(1, 4 + len(temp_df.columns) - 1):
-                cell = ws.cell(row=r, column=col)
-                if cell.value:
-                    text = str(cell.value)
-                    line_breaks = text.count('\n')
-                    wrapped_lines = len(text) // 40 + 1
-                    total_lines = max(line_breaks + 1, wrapped_lines)
-                    max_lines = max(max_lines, total_lines)
-            ws.row_dimensions[r].height = max_lines * 15 + 20 if max_lines > 2 else 40
+                cell.style = cell_style(names, is_header, is_predefined)
+
+        for row_offset, height in enumerate(layout.row_heights[i].tolist()):
+            ws.row_dimensions[current_row + row_offset].height = height
 
         current_row += temp_df.shape[0] + 4
         try:
-            insert_footer_into_worksheet(ws, footer_template, footer_values, current_row)
+            insert_footer_into_worksheet(ws, footer_template, footer_values, current_row, styles)
         except NameError:
             print(f"Footer skipped for chunk {i+1} in sheet with title: {tag_title}")
         current_row += len(footer_template["template"]) + 6
 
-
-
-def process_input_sheet(sheet_name, df):
-    print(f"\nProcessing sheet: {sheet_name}")
-
-    df = df.dropna(how='all').reset_index(drop=True)
-    if df.empty:
-        print(f"Sheet {sheet_name} is empty after dropping NA rows.")
-        return None
-
-    df.columns = [str(col).strip() for col in df.columns]
-    
-    df['original_index'] = df[df.columns[0]]
-    if df['original_index'].duplicated().any():
-        print(f"Duplicate index labels found in {sheet_name}: {df['original_index'][df['original_index'].duplicated()].tolist()}")
-        df['original_index'] = df['original_index'].astype(str) + '_' + df.groupby('original_index').cumcount().astype(str)
-        df['original_index'] = df['original_index'].str.replace('_0$', '', regex=True)
-
-    df.set_index('original_index', inplace=True)
-    df.index = df.index.astype(str).str.strip()
-
-    tag_cols = extract_tag_columns(df.columns)
-    print(f"Tag columns found: {tag_cols}")
-    if not tag_cols:
-        print(f"No valid tag columns in sheet {sheet_name}. Regex used: r'^\\d+/[MD]$'")
-        return None
-
-    field_desc = list(df.index)
-    bit_positions = df.loc[:, "BIT POSITION"] if "BIT POSITION" in df.columns else [""] * len(field_desc)
-    sizes = df.loc[:, "Size (Bits)"] if "Size (Bits)" in df.columns else [""] * len(field_desc)
-
-    output_df = pd.DataFrame({
-        "FIELD NAME / DESCRIPTION": field_desc + ["CRC", "PAGE -X", "PAGE -Y"],
-        "BIT POSITION": list(bit_positions) + ["Y63 - Y34", "", ""],
-        "Size (Bits)": list(sizes) + [30, 64, 64]
-    })
-
-    nt_field_mapping = {
-        'uctypeofTag': 'Type of Tag (9- Normal, 10 - LC, 11- Adj.Line ,12-Junction)',
-        'uc_version': 'Version(As per Spec 4.0)',
-        'uiUniqueID': 'Unique ID of RFID Tag Set',
-        'fAbsLoc': 'Absolute Loc In  meters',
-        'ucTagPlacement': 'Tag Placement(0-InL, 1- SIG(N), 2-SIG(R), 3-Tout, 4-Exit(N),5-Exit(R), 6-SIG(N/R),7-exit tag both directions, 8-Dead stopin Nominal,9- Dead stop in Reverse)',
-        'AbsoluteLocationReset': 'Tag Duplication (0-Main tag,1-Dup tag)',
-        'nominal': {
-            'ucTin': 'TIN in Nominal Direction',
-            'StationId': 'Station ID in Nominal Direction',
-            'comMark': 'Communication in Nominal Direction  (0- Required, 1- Not Required).',
-            'secType': 'Section type in Nominal Direction ( 0-Station, 1- Abs Blk, 2-Auto, 3- VBlk)'
-        },
-        'reverse': {
-            'ucTin': 'TIN in Reverse Direction',
-            'StationId': 'Station ID in Reverse Direction',
-            'comMark': 'Communication in Reverse Direction. (0- Required, 1- Not Required).',
-            'secType': 'Section type in Reverse Direction ( 0-Station, 1- Abs Blk, 2-Auto, 3- VBlk)'
-        }
-    }
-
-    aline_field_mapping = {
-        'uctypeofTag': 'Type of Tag (9- Normal, 10 - LC, 11- Adj.Line ,12-Junction)',
-        'uc_version': 'Version(As per Spec 4.0)',
-        'uiUniqueID': 'Unique ID of RFID Tag Set',
-        'fAbsLoc': 'Absolute Loc In  meters',
-        'nominal': {
-            'ucTin': 'TIN in Nominal Direction'
-        },
-        'reverse': {
-            'ucTin': 'TIN in Reverse Direction'
-        },
-        'AdjLine1_tin': 'Adjacent Line-1 TIN',
-        'AdjLine2_tin': 'Adjacent Line-2 TIN',
-        'AdjLine3_tin': 'Adjacent Line-3 TIN',
-        'AdjLine4_tin': 'Adjacent Line-4 TIN',
-        'AdjLine5_tin': 'Adjacent Line-5 TIN',
-        'ucTagDuplication': 'Tag Duplication (0-Main tag,1-Dup tag)'
-    }
-
-    adj_field_mapping = {
-        'uctypeofTag': 'Type of Tag (9- Normal, 10 - LC, 11- Adj.Line ,12-Junction)',
-        'uc_version': 'Version(As per Spec 4.0)',
-        'uiUniqueID': 'Unique ID of RFID Tag Set',
-        'fAbsLoc1': 'Absolute Loc In  meters-1',
-        'fAbsLoc2': 'Absolute Loc In  meters-2',
-        'nominal': {
-            'ucTin': 'TIN 1'
-        },
-        'reverse': {
-            'ucTin': 'TIN 2'
-        },
-        'dirResetAbsLoc1': 'Direction reset absolute location-1',
-        'dirResetAbsLoc2': 'Direction reset absolute location-2',
-        'locCorrectionType': 'Location Correction Type',
-        'reserved': 'Reserved',
-        'secTypeNominal': 'Section type in nominal direction',
-        'secTypeReverse': 'Section type in reverse direction',
-        'reserved1': 'Reserved_1',
-        'tagType': 'Tag type',
-        'comMarkNominal': 'Communication in nominal direction',
-        'comMarkReverse': 'Communication in reverse direction'
-    }
-
-    tag_data = {}
-    for col in tag_cols:
-        values = []
-        try:
-            for row in field_desc:
-                try:
-                    val = df.at[row, col]
-                    if isinstance(val, pd.Series):
-                        val = val.iloc[0]
-                    values.append(val)
-                except (KeyError, IndexError):
-                    values.append("")
-
-            if sheet_name == 'NT':
-                uctypeofTag = int(df.at[nt_field_mapping['uctypeofTag'], col]) if nt_field_mapping['uctypeofTag'] in df.index else 9
-                uc_version = int(df.at[nt_field_mapping['uc_version'], col]) if nt_field_mapping['uc_version'] in df.index else 1
-                uiUniqueID = int(df.at[nt_field_mapping['uiUniqueID'], col]) if nt_field_mapping['uiUniqueID'] in df.index else 0
-                fAbsLoc = int(df.at[nt_field_mapping['fAbsLoc'], col]) if nt_field_mapping['fAbsLoc'] in df.index and df.at[nt_field_mapping['fAbsLoc'], col] != 'UNKNOWN' else 0
-                ucTagPlacement = int(df.at[nt_field_mapping['ucTagPlacement'], col]) if nt_field_mapping['ucTagPlacement'] in df.index else 0
-                AbsoluteLocationReset = int(df.at[nt_field_mapping['AbsoluteLocationReset'], col]) if nt_field_mapping['AbsoluteLocationReset'] in df.index else 0
-
-                nominal_ucTin = int(df.at[nt_field_mapping['nominal']['ucTin'], col]) if nt_field_mapping['nominal']['ucTin'] in df.index else 0
-                nominal_StationId = int(df.at[nt_field_mapping['nominal']['StationId'], col]) if nt_field_mapping['nominal']['StationId'] in df.index else 0
-                nominal_comMark = int(df.at[nt_field_mapping['nominal']['comMark'], col]) if nt_field_mapping['nominal']['comMark'] in df.index else 0
-                nominal_secType = int(df.at[nt_field_mapping['nominal']['secType'], col]) if nt_field_mapping['nominal']['secType'] in df.index else 0
-
-                reverse_ucTin = int(df.at[nt_field_mapping['reverse']['ucTin'], col]) if nt_field_mapping['reverse']['ucTin'] in df.index else 0
-                reverse_StationId = int(df.at[nt_field_mapping['reverse']['StationId'], col]) if nt_field_mapping['reverse']['StationId'] in df.index else 0
-                reverse_comMark = int(df.at[nt_field_mapping['reverse']['comMark'], col]) if nt_field_mapping['reverse']['comMark'] in df.index else 0
-                reverse_secType = int(df.at[nt_field_mapping['reverse']['secType'], col]) if nt_field_mapping['reverse']['secType'] in df.index else 0
-
-                tag = TagInfoNT(
-                    uctypeofTag=uctypeofTag,
-                    uc_version=uc_version,
-                    uiUniqueID=uiUniqueID,
-                    fAbsLoc=fAbsLoc,
-                    ucTagPlacement=ucTagPlacement,
-                    AbsoluteLocationReset=AbsoluteLocationReset,
-                    stDir=[
-                        TagDirNT(nominal_ucTin, nominal_StationId, nominal_comMark, nominal_secType),
-                        TagDirNT(reverse_ucTin, reverse_StationId, reverse_comMark, reverse_secType)
-                    ]
-                )
-
-                page1, page2, crc = calculate_values_nt(tag)
-                def format_page(page: bytearray) -> str:
-                    trimmed = page[:8]
-                    while trimmed and trimmed[-1] == 0x00 and len(trimmed) > 6:
-                        trimmed = trimmed[:-1]
-                    return ''.join(f"{b:02x}" for b in trimmed)
-
-                # Format output
-                crc_str = f"{crc:08x}"
-                page_x = format_page(page1)
-                page_y = format_page(page2)
-
-
-            elif sheet_name == 'AlineT':
-                uctypeofTag = int(df.at[aline_field_mapping['uctypeofTag'], col]) if aline_field_mapping['uctypeofTag'] in df.index else 11
-                uc_version = int(df.at[aline_field_mapping['uc_version'], col]) if aline_field_mapping['uc_version'] in df.index else 1
-                uiUniqueID = int(df.at[aline_field_mapping['uiUniqueID'], col]) if aline_field_mapping['uiUniqueID'] in df.index else 0
-                fAbsLoc = int(df.at[aline_field_mapping['fAbsLoc'], col]) if aline_field_mapping['fAbsLoc'] in df.index and df.at[aline_field_mapping['fAbsLoc'], col] != 'UNKNOWN' else 0
-                nominal_ucTin = int(df.at[aline_field_mapping['nominal']['ucTin'], col]) if aline_field_mapping['nominal']['ucTin'] in df.index else 0
-                reverse_ucTin = int(df.at[aline_field_mapping['reverse']['ucTin'], col]) if aline_field_mapping['reverse']['ucTin'] in df.index else 0
-                AdjLine1_tin = int(df.at[aline_field_mapping['AdjLine1_tin'], col]) if aline_field_mapping['AdjLine1_tin'] in df.index else 0
-                AdjLine2_tin = int(df.at[aline_field_mapping['AdjLine2_tin'], col]) if aline_field_mapping['AdjLine2_tin'] in df.index else 0
-                AdjLine3_tin = int(df.at[aline_field_mapping['AdjLine3_tin'], col]) if aline_field_mapping['AdjLine3_tin'] in df.index else 0
-                AdjLine4_tin = int(df.at[aline_field_mapping['AdjLine4_tin'], col]) if aline_field_mapping['AdjLine4_tin'] in df.index else 0
-                AdjLine5_tin = int(df.at[aline_field_mapping['AdjLine5_tin'], col]) if aline_field_mapping['AdjLine5_tin'] in df.index else 0
-                ucTagDuplication = int(df.at[aline_field_mapping['ucTagDuplication'], col]) if aline_field_mapping['ucTagDuplication'] in df.index else 0
-                
-                tag = TagInfoAline(
-                    uctypeofTag=uctypeofTag,
-                    uc_version=uc_version,
-                    uiUniqueID=uiUniqueID,
-                    fAbsLoc=fAbsLoc,
-                    stDir=[
-                        TagDirAline(nominal_ucTin),
-                        TagDirAline(reverse_ucTin)
-                    ],
-                    AdjLine1_tin=AdjLine1_tin,
-                    AdjLine2_tin=AdjLine2_tin,
-                    AdjLine3_tin=AdjLine3_tin,
-                    AdjLine4_tin=AdjLine4_tin,
-                    AdjLine5_tin=AdjLine5_tin,
-                    ucTagDuplication=ucTagDuplication
-                )
-
-                result = calculate_values_aline(tag)
-                crc_str = f"{result.crc:08X}".lower()
-                page_x = result.page_x.hex().lower()
-                page_y = result.page_y.hex().lower()
-
-            elif sheet_name == 'AdjT':
-                uctypeofTag = int(df.at[adj_field_mapping['uctypeofTag'], col]) if adj_field_mapping['uctypeofTag'] in df.index else 12
-                uc_version = int(df.at[adj_field_mapping['uc_version'], col]) if adj_field_mapping['uc_version'] in df.index else 1
-                uiUniqueID = int(df.at[adj_field_mapping['uiUniqueID'], col]) if adj_field_mapping['uiUniqueID'] in df.index else 0
-                fAbsLoc1 = int(df.at[adj_field_mapping['fAbsLoc1'], col]) if adj_field_mapping['fAbsLoc1'] in df.index and df.at[adj_field_mapping['fAbsLoc1'], col] != 'UNKNOWN' else 0
-                fAbsLoc2 = int(df.at[adj_field_mapping['fAbsLoc2'], col]) if adj_field_mapping['fAbsLoc2'] in df.index and df.at[adj_field_mapping['fAbsLoc2'], col] != 'UNKNOWN' else 0
-                nominal_ucTin = int(df.at[adj_field_mapping['nominal']['ucTin'], col]) if adj_field_mapping['nominal']['ucTin'] in df.index else 0
-                reverse_ucTin = int(df.at[adj_field_mapping['reverse']['ucTin'], col]) if adj_field_mapping['reverse']['ucTin'] in df.index else 0
-                dirResetAbsLoc1 = int(df.at[adj_field_mapping['dirResetAbsLoc1'], col]) if adj_field_mapping['dirResetAbsLoc1'] in df.index else 0
-                dirResetAbsLoc2 = int(df.at[adj_field_mapping['dirResetAbsLoc2'], col]) if adj_field_mapping['dirResetAbsLoc2'] in df.index else 0
-                locCorrectionType = int(df.at[adj_field_mapping['locCorrectionType'], col]) if adj_field_mapping['locCorrectionType'] in df.index else 0
-                reserved = int(df.at[adj_field_mapping['reserved'], col]) if adj_field_mapping['reserved'] in df.index else 0
-                secTypeNominal = int(df.at[adj_field_mapping['secTypeNominal'], col]) if adj_field_mapping['secTypeNominal'] in df.index else 0
-                secTypeReverse = int(df.at[adj_field_mapping['secTypeReverse'], col]) if adj_field_mapping['secTypeReverse'] in df.index else 0
-                reserved1 = int(df.at[adj_field_mapping['reserved1'], col]) if adj_field_mapping['reserved1'] in df.index else 0
-                tagType = int(df.at[adj_field_mapping['tagType'], col]) if adj_field_mapping['tagType'] in df.index else 0
-                comMarkNominal = int(df.at[adj_field_mapping['comMarkNominal'], col]) if adj_field_mapping['comMarkNominal'] in df.index else 0
-                comMarkReverse = int(df.at[adj_field_mapping['comMarkReverse'], col]) if adj_field_mapping['comMarkReverse'] in df.index else 0
-
-
-                tag = TagInfoAdj(
-                    uctypeofTag=uctypeofTag,
-                    uc_version=uc_version,
-                    uiUniqueID=uiUniqueID,
-                    stDir=[
-                        TagDirAdj(nominal_ucTin, secTypeNominal, dirResetAbsLoc1, comMarkNominal, fAbsLoc1),
-                        TagDirAdj(reverse_ucTin, secTypeReverse, dirResetAbsLoc2, comMarkReverse, fAbsLoc2)
-                    ],
-                    locCorrectionType=locCorrectionType,
-                    reserved=reserved,
-                    reserved1=reserved1,
-                    tagType=tagType
-                )
-                
-                page1, page2, crc = calculate_values_adj(tag)
-                def format_page(page: bytearray) -> str:
-                    trimmed = page[:8]
-                    while trimmed and trimmed[-1] == 0x00 and len(trimmed) > 6:
-                        trimmed = trimmed[:-1]
-                    return ''.join(f"{b:02x}" for b in trimmed)
-
-                # Format output
-                crc_str = f"{crc:08x}"
-                page_x = format_page(page1)
-                page_y = format_page(page2)
-
-            else:
-                crc_str = 0
-                page_x = '0 0 0 0 0 0 0 0'
-                page_y = '0 0 0 0 0 0 0 0'
-
-            values += [crc_str, page_x, page_y]
-            tag_data[str(col)] = values
-
-        except Exception as e:
-            print(f"Error processing column {col} in sheet {sheet_name}: {e}")
-            values = [""] * len(field_desc) + [0, '0 0 0 0 0 0 0 0', '0 0 0 0 0 0 0 0']
-            tag_data[str(col)] = values
-
-    if tag_data:
-        tag_df = pd.DataFrame(tag_data, index=output_df.index)
-        output_df = pd.concat([output_df, tag_df], axis=1)
-
-    return output_df
+def _styled_cell(ws, value=None, style=None):
+    cell = WriteOnlyCell(ws, value=value)
+    if style is not None:
+        cell.style = style
+    return cell
+
+def write_sheet_stream(ws, df, tag_title, styles=None):
+    """
+    format_sheet for a write-only worksheet: the same cells, styles, merges, widths and heights,
+    taken from components.tag_sheet_layout and written one row at a time.
+    """
+    from components.tag_data_footer import footer_rows, load_footer_template
+    if isinstance(df, (TagBatch, TagSheetModel)):
+        df = df.to_frame()
+
+    styles = styles or StyleRegistry.of(ws.parent)
+    names = register_td_styles(styles)
+    footer_template = load_footer_template()
+    total_chunks = -(-len(tag_column_names(df)) // CHUNK_SIZE)
+
+    # Column widths are written ahead of the rows
+    layout = sheet_layout(df)
+    for col_letter, width in layout.column_widths.items():
+        ws.column_dimensions[col_letter].width = width
+
+    written = 0
+
+    def append(row_num, cells, height=None):
+        nonlocal written
+        while written < row_num - 1:
+            ws.append([])
+            written += 1
+        if height is not None:
+            ws.row_dimensions[row_num].height = height
+        ws.append(cells)
+        written += 1
+        # The row is on disk; its dimension is not needed any more
+        ws.row_dimensions.pop(row_num, None)
+
+    for chunk in iter_chunk_layouts(df, len(footer_template["template"]), layout):
+        row_num = chunk.title_row
+        append(row_num, [_styled_cell(ws, tag_title, names["title"])], TITLE_HEIGHT)
+        add_merged_range(ws, f"A{row_num}:{get_column_letter(TITLE_COLUMNS)}{row_num}")
+
+        for r_offset, (values, height) in enumerate(zip(chunk.rows, chunk.row_heights)):
+            row_num = chunk.title_row + 1 + r_offset
+            is_header = r_offset == 0
+            cells = [None] * (len(values) + LABEL_COLUMNS - 1)
+            for c_idx, (col, value) in enumerate(zip(table_columns(values), values), start=1):
+                cells[col - 1] = _styled_cell(ws, value, cell_style(names, is_header, c_idx <= 3))
+            # B and C are merged into A and keep only their border
+            for col in range(2, LABEL_COLUMNS + 1):
+                cells[col - 1] = _styled_cell(ws, style=names["merged"])
+            append(row_num, cells, height)
+            add_merged_range(ws, f"A{row_num}:{get_column_letter(LABEL_COLUMNS)}{row_num}")
+
+        rows, merges = footer_rows(footer_template, get_footer_values(chunk.page, total_chunks), styles)
+        for r_offset, row in enumerate(rows):
+            cells = [None] * max(row, default=0)
+            for col, (value, style) in row.items():
+                if value is not None or style is not None:
+                    cells[col - 1] = _styled_cell(ws, value, style)
+            append(chunk.footer_row + r_offset, cells, 50)
+        for min_col, min_row, max_col, max_row in merges:
+            add_merged_range(ws, f"{get_column_letter(min_col)}{chunk.footer_row + min_row}:"
+                                 f"{get_column_letter(max_col)}{chunk.footer_row + max_row}")
+
+
+def build_formatted_workbook(sheets, writer=None):
+    """
+    The formatted TD workbook of (sheet_name, tag_title, TagSheetModel or None) sheets, not yet
+    saved, and the number of sheets in it. `writer` ("memory" / "stream") defaults to
+    TD_EXCEL_WRITER; a "stream" workbook has its rows written already and is finished by save().
+    """
+    stream = get_excel_writer(writer) == "stream"
+    wb = Workbook(write_only=stream)
+    styles = StyleRegistry.of(wb)
+    first = True
+    processed_sheets = 0
+
+    for sheet_name, tag_title, model in sheets:
+        if model is None:
+            print(f"Skipping sheet {sheet_name} — no valid tag data.")
+            continue
+
+        if stream:
+            write_sheet_stream(wb.create_sheet(sheet_name), model, tag_title, styles)
+            processed_sheets += 1
+            continue
+
+        ws = wb.active if first else wb.create_sheet()
+        ws.title = sheet_name
+        first = False
+        processed_sheets += 1
+
+        format_sheet(ws, model, tag_title, styles)
+
+    return wb, processed_sheets
+
+def write_formatted_workbook(sheets, output_file, writer=None):
+    """
+    Writes (sheet_name, tag_title, TagSheetModel or None) sheets to `output_file` as the formatted
+    TD workbook. Returns the number of sheets written (nothing is saved when it is 0). `writer`
+    ("memory" / "stream") defaults to TD_EXCEL_WRITER.
+    """
+    wb, processed_sheets = build_formatted_workbook(sheets, writer)
+    if processed_sheets == 0:
+        return 0
+
+    wb.save(output_file)
+    return processed_sheets
+
+def convert_workbook(input_path, output_file, workers=0, sheets=None, writer=None):
+    """
+    Writes the formatted TD workbook for `input_path` to `output_file`. Returns the number of
+    sheets written (nothing is saved when it is 0). `workers` > 1 processes sheets in a process pool.
+    With `sheets`, only those sheets are re-read from an edited workbook; the rest are merged
+    in as they were last generated.
+    """
+    written = write_formatted_workbook(PARSE_CACHE.sheet_models(input_path, workers, sheets), output_file, writer)
+    if written:
+        print(f"✅ Final Excel saved: {output_file}")
+    return written
 
 def process_excel():
     try:
@@ -413,6 +273,11 @@ def process_excel():
         if drive and not os.path.exists(drive):
             return jsonify({"error": f"Drive {drive} does not exist or is not accessible"}), 400
 
+        try:
+            sheets = parse_sheet_selection(request.form.getlist('sheets'), input_path)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
         # Create full output directory if not present
         if not os.path.exists(output_path):
             os.makedirs(output_path)
@@ -427,34 +292,10 @@ def process_excel():
         if os.path.isfile(output_file):
             os.remove(output_file)
         
-        wb = Workbook()
-        all_sheets = pd.read_excel(input_path, sheet_name=None, header=1)
-        all_raw = pd.read_excel(input_path, sheet_name=None, header=None)
-        first = True
-        processed_sheets = 0
-
-        for sheet_name, df in all_sheets.items():
-            raw_df = all_raw[sheet_name]
-            tag_title = str(raw_df.iloc[0, 0]) if not raw_df.empty else "TAG"
-
-            formatted_df = process_input_sheet(sheet_name, df)
-            if formatted_df is None:
-                print(f"Skipping sheet {sheet_name} — no valid tag data.")
-                continue
-
-            ws = wb.active if first else wb.create_sheet()
-            ws.title = sheet_name
-            first = False
-            processed_sheets += 1
-
-            format_sheet(ws, formatted_df, tag_title)
-
+        processed_sheets = convert_workbook(input_path, output_file, get_worker_count(request.form.get('workers')), sheets)
         if processed_sheets == 0:
             return jsonify({"error": "No sheets processed. Output file not saved."}), 400
 
-        wb.save(output_file)
-        print(f"✅ Final Excel saved: {output_file}")
-
         return send_file(
             output_file,
             as_attachment=True,